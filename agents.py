@@ -0,0 +1,129 @@
+""" Agents choosing actions of player for headless games,
+each agent act on a Simulation instance """
+import random
+from collections import Counter
+
+import constant
+from pathfinding import pathfinder
+
+# Directions an agent can choose, staying is never useful
+DIRECTIONS = [constant.LEFT, constant.RIGHT, constant.UP, constant.DOWN]
+
+
+class RandomAgent:
+    """ Walk in a random direction at each step """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def reset(self, seed=None):
+        self.rng.seed(seed)
+
+    def act(self, sim):
+        return self.rng.choice(DIRECTIONS)
+
+
+class GreedyAgent(RandomAgent):
+    """ Walk toward nearest remaining item, then toward guardian.
+    Least visited cells are preferred to escape dead ends """
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.visits = Counter()
+
+    def reset(self, seed=None):
+        super().reset(seed)
+        self.visits.clear()
+
+    def act(self, sim):
+        targets = [pos for pos in sim.items if pos is not None]
+        if not targets:
+            targets = [sim.guardian]
+        self.visits[sim.player] += 1
+        best = None
+        best_score = None
+        for action in DIRECTIONS:
+            cell = sim.target(action)
+            if not sim.grid.is_walkable(cell):
+                continue
+            distance = min(
+                abs(cell[0] - pos[0]) + abs(cell[1] - pos[1])
+                for pos in targets
+            )
+            score = (self.visits[cell], distance, self.rng.random())
+            if best_score is None or score < best_score:
+                best = action
+                best_score = score
+        if best is None:
+            return self.rng.choice(DIRECTIONS)
+        return best
+
+
+class ShortestPathAgent:
+    """ Follow shortest path to nearest remaining item,
+    then to guardian """
+
+    def __init__(self, seed=None):
+        pass
+
+    def reset(self, seed=None):
+        pass
+
+    def act(self, sim):
+        paths = pathfinder(sim.grid)
+        targets = [pos for pos in sim.items if pos is not None]
+        distances = [
+            (paths.distance(sim.player, pos), pos)
+            for pos in targets
+            if paths.reachable(sim.player, pos)
+        ]
+        if distances:
+            target = min(distances)[1]
+        else:
+            target = sim.guardian
+        return paths.direction(sim.player, target)
+
+
+class ScriptedAgent:
+    """ Repeat a fixed sequence of actions written with letters
+    L, R, U, D and S for stay """
+
+    LETTERS = {
+        "L": constant.LEFT,
+        "R": constant.RIGHT,
+        "U": constant.UP,
+        "D": constant.DOWN,
+        "S": constant.STAY,
+    }
+
+    def __init__(self, script, seed=None):
+        if not script:
+            raise ValueError("Scripted agent need a non empty script")
+        for letter in script.upper():
+            if letter not in self.LETTERS:
+                raise ValueError(f"Invalid action {letter!r} in script")
+        self.actions = [self.LETTERS[letter] for letter in script.upper()]
+        self._next = 0
+
+    def reset(self, seed=None):
+        self._next = 0
+
+    def act(self, sim):
+        action = self.actions[self._next % len(self.actions)]
+        self._next += 1
+        return action
+
+
+AGENTS = {
+    "random": RandomAgent,
+    "greedy": GreedyAgent,
+    "shortest": ShortestPathAgent,
+    "scripted": ScriptedAgent,
+}
+
+
+def make_agent(name, seed=None, script=None):
+    """ Return a new agent instance from its name """
+    if name == "scripted":
+        return ScriptedAgent(script, seed)
+    return AGENTS[name](seed)
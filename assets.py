@@ -0,0 +1,125 @@
+""" Load game images packed in a single texture atlas.
+Pixels converted to display format are cached on disk,
+so next launches skip decoding of PNG files """
+import hashlib
+import json
+import time
+
+import pygame
+
+import constant
+
+# Information on last loading, to measure startup time
+stats = {}
+
+
+def load_assets(
+    names, folder=constant.RESSOURCE_FOLDER, cache=constant.ASSET_CACHE
+):
+    """ Load images of names inside folder and return a dict of
+    surfaces sharing the same atlas, with colorkey already set.
+    A display mode must be set before loading """
+    start = time.perf_counter()
+    paths = [folder / str(name + ".png") for name in names]
+
+    # Cache is only valid for the same files and display pixel format
+    display = pygame.display.get_surface()
+    digest = hashlib.sha1(
+        f"{display.get_bitsize()}{display.get_masks()}".encode()
+    )
+    for path in paths:
+        digest.update(path.stem.encode())
+        digest.update(path.read_bytes())
+    cache_file = cache / str(digest.hexdigest() + ".atlas")
+
+    atlas, rects = _read_cache(cache_file, display)
+    cached = atlas is not None
+    if not cached:
+        images = {
+            path.stem: pygame.image.load(str(path)).convert() for path in paths
+        }
+        atlas, rects = pack(images)
+        _write_cache(cache_file, atlas, rects)
+
+    storage = {}
+    for name, rect in rects.items():
+        storage[name] = atlas.subsurface(rect)
+        storage[name].set_colorkey(constant.BLACK)
+
+    stats.clear()
+    stats.update(
+        {
+            "images": len(storage),
+            "cached": cached,
+            "atlas_size": atlas.get_size(),
+            "seconds": time.perf_counter() - start,
+        }
+    )
+    return storage
+
+
+def pack(images, width=constant.ATLAS_WIDTH):
+    """ Pack images on rows of a single surface, highest images first.
+    Return the atlas surface and a dict of image rect inside it """
+    rects = {}
+    x = y = row_h = 0
+    for name, image in sorted(
+        images.items(), key=lambda item: -item[1].get_height()
+    ):
+        w, h = image.get_size()
+        if x and x + w > width:
+            x = 0
+            y += row_h
+            row_h = 0
+        rects[name] = pygame.Rect(x, y, w, h)
+        x += w
+        row_h = max(row_h, h)
+
+    size = (
+        max((rect.right for rect in rects.values()), default=1),
+        max((rect.bottom for rect in rects.values()), default=1),
+    )
+    atlas = pygame.Surface(size).convert()
+    for name, rect in rects.items():
+        atlas.blit(images[name], rect)
+    return atlas, rects
+
+
+def _read_cache(cache_file, display):
+    """ Return atlas and rects stored in cache_file,
+    (None, None) if cache can't be used """
+    try:
+        with open(str(cache_file), "rb") as atlas_file:
+            header = json.loads(atlas_file.readline())
+            pixels = atlas_file.read()
+    except (OSError, ValueError):
+        return None, None
+
+    atlas = pygame.Surface(header["size"], 0, display)
+    if (
+        atlas.get_pitch() != header["pitch"]
+        or len(pixels) != atlas.get_pitch() * atlas.get_height()
+    ):
+        return None, None
+    buffer = atlas.get_buffer()
+    buffer.write(pixels)
+    del buffer
+    rects = {name: pygame.Rect(rect) for name, rect in header["rects"].items()}
+    return atlas, rects
+
+
+def _write_cache(cache_file, atlas, rects):
+    """ Store atlas pixels and rects in cache_file,
+    game still work if cache can't be written """
+    header = {
+        "size": atlas.get_size(),
+        "pitch": atlas.get_pitch(),
+        "rects": {name: list(rect) for name, rect in rects.items()},
+    }
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(str(cache_file), "wb") as atlas_file:
+            atlas_file.write(json.dumps(header).encode() + b"\n")
+            atlas_file.write(atlas.get_buffer().raw)
+    except OSError as error:
+        print(f"Unable to write assets cache: {error}")
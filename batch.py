@@ -0,0 +1,179 @@
+""" Contain BatchSimulation class, many independent games on the
+same level stored as NumPy arrays and advanced all at once """
+import numpy as np
+
+import constant
+from pathfinding import pathfinder
+
+
+class BatchSimulation:
+    """ N games advanced together by vectorized steps, with the same
+    rules than Simulation. Positions are flat grid indexes
+    (y * width + x) and all state arrays are updated in place, so the
+    views returned by observe stay valid between steps """
+
+    def __init__(self, level, games, seed=None, items=None):
+        """ level is a Level instance, games the number of games
+        and items the number of items to place inside each maze,
+        level.items by default """
+        grid = level.grid
+        self.level = level
+        self.width = grid.width
+        self.games = games
+        if items is None:
+            items = level.items
+        self.items_needed = items
+        self.rng = np.random.default_rng(seed)
+
+        # Cell reached from each cell with each action,
+        # blocked moves stay on the same cell
+        size = grid.width * grid.height
+        walkable = np.frombuffer(grid.tiles, dtype=np.uint8) == constant.FLOOR
+        cells = np.arange(size, dtype=np.int64)
+        x = cells % grid.width
+        y = cells // grid.width
+        self._next = np.empty((size, len(constant.ACTIONS)), dtype=np.int64)
+        for action, move in constant.MOVES.items():
+            target_x = x + move[0]
+            target_y = y + move[1]
+            inside = (
+                (target_x >= 0)
+                & (target_x < grid.width)
+                & (target_y >= 0)
+                & (target_y < grid.height)
+            )
+            target = np.where(inside, target_y * grid.width + target_x, 0)
+            self._next[:, action] = np.where(
+                inside & walkable[target], target, cells
+            )
+
+        # Cells where items can be placed, reachable from player start
+        # without crossing guardians
+        start = grid.index(level.player)
+        self._free = np.frombuffer(
+            pathfinder(grid).safe_cells(level.player, level.guardians),
+            dtype=np.int64,
+        )
+        if len(self._free) < items:
+            raise ValueError(
+                f"Only {len(self._free)} free cells for {items} items"
+            )
+
+        # Guardians are the same in all games, the guardian of each cell
+        # (-1 if none) is found with a lookup table
+        self.guardians = np.array(
+            [grid.index(pos) for pos in level.guardians], dtype=np.int64
+        )
+        self._guardian_at = np.full(size, -1, dtype=np.int64)
+        self._guardian_at[self.guardians] = np.arange(len(self.guardians))
+
+        self._start = start
+        self.player = np.full(games, start, dtype=np.int64)
+        # Items of each game are sorted by cell, and stored with an offset
+        # of game index * size in _item_keys, so that all items of all
+        # games form one sorted array searched for players cells
+        self.items = np.empty((games, items), dtype=np.int64)
+        self._offsets = np.arange(games, dtype=np.int64) * size
+        self._item_keys = np.empty((games, items), dtype=np.int64)
+        self.collected = np.zeros((games, items), dtype=bool)
+        self.collected_count = np.zeros(games, dtype=np.int64)
+        self.player_alive = np.ones(games, dtype=bool)
+        self.guardian_alive = np.ones((games, len(self.guardians)), dtype=bool)
+        self.finished = np.zeros(games, dtype=bool)
+        self.steps = np.zeros(games, dtype=np.int64)
+        self.reset()
+
+    def reset(self, games=None):
+        """ Start again games selected by games (boolean mask or indexes),
+        all games by default. Items are placed again """
+        if games is None:
+            games = np.arange(self.games)
+        elif np.asarray(games).dtype == bool:
+            games = np.flatnonzero(games)
+        games = np.asarray(games, dtype=np.int64)
+
+        self.player[games] = self._start
+        self.collected[games] = False
+        self.collected_count[games] = 0
+        self.player_alive[games] = True
+        self.guardian_alive[games] = True
+        self.finished[games] = False
+        self.steps[games] = 0
+        self._place(games)
+
+    def _place(self, games):
+        """ Draw distinct random free cells for items of games """
+        # Games with two items on the same cell are drawn again, which
+        # is only efficient while duplicates are rare
+        if self.items_needed**2 > len(self._free):
+            for game in games:
+                picks = self.rng.choice(
+                    len(self._free), self.items_needed, replace=False
+                )
+                self.items[game] = self._free[np.sort(picks)]
+            todo = games[:0]
+        else:
+            todo = games
+        while len(todo):
+            picks = self.rng.integers(
+                0, len(self._free), (len(todo), self.items_needed)
+            )
+            # Free cells are sorted, so are items with sorted picks
+            ordered = np.sort(picks, axis=1)
+            self.items[todo] = self._free[ordered]
+            # Draw again games with two items on the same cell
+            duplicate = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+            todo = todo[duplicate]
+        self._item_keys[games] = self.items[games] + self._offsets[games, None]
+
+    def step(self, actions):
+        """ Advance all unfinished games with one action per game,
+        return the finished boolean array """
+        active = ~self.finished
+        np.copyto(self.player, self._next[self.player, actions], where=active)
+        self.steps += active
+
+        # Items are collected when player is on their cell, found by
+        # a binary search in the items of all games
+        if self.items_needed:
+            keys = self._offsets + self.player
+            item_keys = self._item_keys.reshape(-1)
+            slots = np.minimum(
+                np.searchsorted(item_keys, keys), len(item_keys) - 1
+            )
+            on_item = active & (item_keys[slots] == keys)
+            on_item[on_item] = ~self.collected.reshape(-1)[slots[on_item]]
+            self.collected.reshape(-1)[slots[on_item]] = True
+            self.collected_count += on_item
+        ready = self.collected_count >= self.items_needed
+
+        # Combat between guardian and player: end of the game
+        # if player is not ready or if last guardian is defeated
+        guardian = self._guardian_at[self.player]
+        games = np.flatnonzero(active & (guardian >= 0))
+        guardian = guardian[games]
+        alive = self.guardian_alive[games, guardian]
+        games = games[alive]
+        guardian = guardian[alive]
+        win = ready[games]
+        self.guardian_alive[games[win], guardian[win]] = False
+        self.player_alive[games[~win]] = False
+        self.finished[games[~win]] = True
+        self.finished[games[win]] = ~self.guardian_alive[games[win]].any(
+            axis=1
+        )
+        return self.finished
+
+    def observe(self):
+        """ Return dict of zero-copy views on the state of all games """
+        return {
+            "player": self.player,
+            "guardians": self.guardians,
+            "items": self.items,
+            "collected": self.collected,
+            "collected_count": self.collected_count,
+            "player_alive": self.player_alive,
+            "guardian_alive": self.guardian_alive,
+            "finished": self.finished,
+            "steps": self.steps,
+        }
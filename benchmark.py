@@ -0,0 +1,208 @@
+""" Headless benchmarks of startup, frame time, restart, items placement
+and memory, run with SDL dummy video driver, for example:
+
+    python benchmark.py --sizes 15,200,1000 --output bench.json
+    python benchmark.py --compare bench.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Benchmarks never open a real window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np  # noqa: E402
+import pygame  # noqa: E402
+
+import constant  # noqa: E402
+from generator import generate  # noqa: E402
+from grid import Grid  # noqa: E402
+from level import Level  # noqa: E402
+from main import Game  # noqa: E402
+from maze import Maze  # noqa: E402
+from simulation import Simulation  # noqa: E402
+
+
+def timings(func, repeat):
+    """ Call func repeat times and return statistics of its duration
+    in milliseconds """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {
+        "median": statistics.median(durations),
+        "min": min(durations),
+        "max": max(durations),
+    }
+
+
+def make_level(size, density, seed, folder):
+    """ Write a square level of a random maze, with walls opened at
+    random until given density of floor inside border walls is
+    reached, and return its path. Opening walls of a maze keeps
+    all floor connected, so items can always be placed """
+    level = generate(size, size, seed)
+    tiles = np.array(level.grid.tiles, dtype=np.uint8)
+    inner = np.zeros((size, size), dtype=bool)
+    inner[1:-1, 1:-1] = True
+    walls = np.flatnonzero((tiles == constant.WALL) & inner.reshape(-1))
+    # Density below the one of the maze keeps the maze as it is
+    missing = int(density * (size - 2) ** 2) - (
+        (size - 2) ** 2 - len(walls)
+    )
+    if missing > 0:
+        rng = np.random.default_rng(seed)
+        tiles[rng.choice(walls, missing, replace=False)] = constant.FLOOR
+    level.grid = Grid(size, size, tiles)
+    path = Path(folder) / f"bench_{size}_{density}.mgl"
+    level.save(path)
+    return path
+
+
+def bench_startup(path, repeat):
+    """ Duration of Game and Maze initialization """
+    return {
+        "game_init": timings(lambda: Game(path), repeat),
+        "maze_init": timings(lambda: Maze(path), repeat),
+    }
+
+
+def bench_frames(game, frames, seed):
+    """ Duration of a frame of play with player walking randomly """
+    rng = random.Random(seed)
+    game.status = constant.PLAY
+    game._redraw = True
+    maze = game.maze
+    durations = []
+    for _ in range(frames):
+        action = rng.choice(constant.ACTIONS[1:])
+        start = time.perf_counter()
+        if maze.update(action) != constant.PLAY:
+            maze.restart()
+        rects = maze.display(game.screen)
+        game._present(rects)
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return {
+        "median": statistics.median(durations),
+        "p95": durations[int(len(durations) * 0.95)],
+        "max": durations[-1],
+    }
+
+
+def bench_restart(maze, repeat):
+    """ Duration of Maze.restart """
+    return timings(maze.restart, repeat)
+
+
+def bench_placement(path, operations):
+    """ Number of random item positions drawn and released per second """
+    sim = Simulation(Level.load(path), seed=0)
+    start = time.perf_counter()
+    for _ in range(operations):
+        sim.free_cells.release(sim._random_pos())
+    return {
+        "per_second": operations / (time.perf_counter() - start),
+        "free_cells": len(sim.free_cells),
+    }
+
+
+def bench_memory(path):
+    """ Memory allocated by Python objects of a Maze and size of its
+    rendered surfaces """
+    tracemalloc.start()
+    maze = Maze(path)
+    maze.display(pygame.display.get_surface())
+    python_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    surfaces = [maze.background] + list(maze.chunks._chunks.values())
+    return {
+        "python_bytes": python_bytes,
+        "surface_bytes": sum(
+            surface.get_pitch() * surface.get_height() for surface in surfaces
+        ),
+    }
+
+
+def run(args):
+    """ Run all benchmarks and return results as a dict """
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        # None stands for the default data.json level
+        levels = {"default": None}
+        for size in args.sizes:
+            for density in args.densities:
+                levels[f"{size}_{density}"] = make_level(
+                    size, density, args.seed, folder
+                )
+
+        for name, path in levels.items():
+            print(f"Benchmark of level {name}")
+            result = bench_startup(path, args.repeat)
+            game = Game(path)
+            result["frame"] = bench_frames(game, args.frames, args.seed)
+            result["restart"] = bench_restart(game.maze, args.repeat)
+            result["placement"] = bench_placement(path, args.operations)
+            result["memory"] = bench_memory(path)
+            results[name] = result
+    pygame.quit()
+    return results
+
+
+def compare(results, reference):
+    """ Print ratio of each timing against reference results """
+    for level, result in results.items():
+        for bench, values in result.items():
+            for key, value in values.items():
+                try:
+                    old = reference[level][bench][key]
+                except KeyError:
+                    continue
+                if old:
+                    ratio = value / old
+                    print(f"{level:>12} {bench:>10} {key:>13} {ratio:.2f}x")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes",
+        type=lambda text: [int(size) for size in text.split(",")],
+        default=[200, 1000],
+        help="side of generated levels, comma separated",
+    )
+    parser.add_argument(
+        "--densities",
+        type=lambda text: [float(value) for value in text.split(",")],
+        default=[0.75, 0.95],
+        help="floor density of generated levels, comma separated,"
+        + " at least the one of a maze",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--operations", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="json file of results")
+    parser.add_argument("--compare", help="json file of previous results")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args)
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=4)
+    if args.compare:
+        with open(args.compare) as reference:
+            compare(results, json.load(reference))
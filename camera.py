@@ -0,0 +1,134 @@
+""" Contain Camera class to follow player inside large maze and
+ChunkCache class to render only visible part of maze """
+from collections import OrderedDict
+
+import pygame
+
+import constant
+
+
+class Camera:
+    """ Rectangle of maze visible on screen, in pixel,
+    kept inside maze limits """
+
+    def __init__(self, view_size, world_size):
+        """ view_size and world_size are (width, height) in pixel """
+        self.rect = pygame.Rect((0, 0), view_size)
+        self.world = pygame.Rect((0, 0), world_size)
+
+    @property
+    def offset(self):
+        """ Return pixel position of camera inside maze """
+        return self.rect.topleft
+
+    def follow(self, center):
+        """ Center camera on center pixel position as far as possible
+        and return if camera moved """
+        previous = self.rect.topleft
+        self.rect.center = center
+        self.rect.clamp_ip(self.world)
+        # Maze smaller than camera stay at top left corner
+        if self.world.width <= self.rect.width:
+            self.rect.left = 0
+        if self.world.height <= self.rect.height:
+            self.rect.top = 0
+        return self.rect.topleft != previous
+
+    def sees(self, rect):
+        """ return if rect in maze pixel referential is visible """
+        return self.rect.colliderect(rect)
+
+
+class ChunkCache:
+    """ Pre-rendered surfaces of square blocks of maze tiles.
+    Only chunks seen by camera are rendered and least recently used
+    chunks are dropped to keep memory bounded """
+
+    def __init__(
+        self,
+        grid,
+        tiles,
+        chunk_size=constant.CHUNK_SIZE,
+        max_chunks=constant.MAX_CHUNKS,
+    ):
+        """ grid is the Grid of the maze, tiles a dict of surfaces
+        to draw for each tile type """
+        self.grid = grid
+        self.tiles = tiles
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.chunk_w = chunk_size * constant.SPRITE_W
+        self.chunk_h = chunk_size * constant.SPRITE_H
+        self._chunks = OrderedDict()
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def clear(self):
+        """ Drop all rendered chunks, to call when maze changes """
+        self._chunks.clear()
+
+    def discard(self, pos):
+        """ Drop chunk containing pos tile if rendered """
+        self._chunks.pop(
+            (pos[0] // self.chunk_size, pos[1] // self.chunk_size), None
+        )
+
+    def get(self, key):
+        """ Return surface of chunk at key (column, row),
+        rendering it if not in cache """
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+
+        chunk = self._render(key)
+        self._chunks[key] = chunk
+        while len(self._chunks) > self.max_chunks:
+            self._chunks.popitem(last=False)
+        return chunk
+
+    def _render(self, key):
+        """ Draw all tiles of chunk at key on a new surface """
+        chunk = pygame.Surface((self.chunk_w, self.chunk_h)).convert()
+        chunk.fill(constant.BLACK)
+        grid = self.grid
+        tiles = grid.tiles
+        first_x = key[0] * self.chunk_size
+        first_y = key[1] * self.chunk_size
+        last_x = min(first_x + self.chunk_size, grid.width)
+        last_y = min(first_y + self.chunk_size, grid.height)
+        blits = []
+        for y in range(first_y, last_y):
+            row = y * grid.width
+            pixel_y = (y - first_y) * constant.SPRITE_H
+            for x in range(first_x, last_x):
+                blits.append(
+                    (
+                        self.tiles[tiles[row + x]],
+                        ((x - first_x) * constant.SPRITE_W, pixel_y),
+                    )
+                )
+        chunk.blits(blits, doreturn=False)
+        return chunk
+
+    def draw(self, surface, view, dest=(0, 0)):
+        """ Draw maze area inside view rect (maze pixel referential)
+        on surface at dest position """
+        first_col = view.left // self.chunk_w
+        last_col = (view.right - 1) // self.chunk_w
+        first_row = view.top // self.chunk_h
+        last_row = (view.bottom - 1) // self.chunk_h
+        # Chunks can overflow area of the view on surface
+        previous_clip = surface.get_clip()
+        surface.set_clip(pygame.Rect(dest, view.size))
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                surface.blit(
+                    self.get((col, row)),
+                    (
+                        dest[0] + col * self.chunk_w - view.left,
+                        dest[1] + row * self.chunk_h - view.top,
+                    ),
+                )
+        surface.set_clip(previous_clip)
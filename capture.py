@@ -0,0 +1,225 @@
+""" Contain FrameCapture class, frames of the screen written to a PNG
+sequence or a raw video stream by a background thread """
+import struct
+import sys
+import threading
+import zlib
+from pathlib import Path
+from queue import Empty, Queue
+
+import numpy as np
+import pygame
+
+import constant
+
+# Suffix of raw video files, RGB pixels of frames one after the other
+RAW_SUFFIX = ".raw"
+# Start of every PNG file, and zlib level of PNG frames, fast
+# rather than small as frames are mostly made of plain tiles
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COMPRESSION = 1
+
+
+def png_chunk(kind, data):
+    """ Return PNG chunk of kind, 4 letters as bytes, holding data """
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)))
+    )
+
+
+def write_png(path, pixels):
+    """ Write pixels, an array of shape (height, width, 3), in PNG file
+    at path. Unlike pygame.image.save, zlib lets other threads run
+    while it compresses """
+    height, width = pixels.shape[:2]
+    # Each row starts with its filter type, 0 for none
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = pixels.reshape(height, width * 3)
+    # 8 bits per channel, RGB colors, no interlacing
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    with open(str(path), "wb") as png:
+        png.write(PNG_SIGNATURE)
+        png.write(png_chunk(b"IHDR", header))
+        png.write(png_chunk(b"IDAT", zlib.compress(rows, PNG_COMPRESSION)))
+        png.write(png_chunk(b"IEND", b""))
+
+
+class FrameCapture:
+    """ Frames of screen copied in a ring of preallocated arrays and
+    encoded by a worker thread. When encoding falls behind and all
+    arrays are waiting, new frames are dropped instead of slowing
+    down the game, unless capture waits for them """
+
+    def __init__(
+        self,
+        output,
+        every=1,
+        slots=constant.CAPTURE_SLOTS,
+        fps=constant.CAPTURE_FPS,
+        wait=False,
+    ):
+        """ output is a folder of numbered PNG files, or a file of raw
+        frames if its suffix is RAW_SUFFIX. Only one frame out of every
+        is captured, for a video at fps frames per second.
+        With wait, no frame is dropped and capture waits for a free
+        array, for games not played in real time """
+        self.output = Path(output)
+        self.raw = self.output.suffix == RAW_SUFFIX
+        self.every = max(1, every)
+        self.fps = fps / self.every
+        self.wait = wait
+        # Size of frames, set by first frame
+        self.size = None
+        self.frames = 0
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self._slots_count = slots
+        self._slots = None
+        # Index of red, green and blue bytes of 32 bits pixels, None
+        # if frames are captured as RGB arrays
+        self._channels = None
+        # Index of arrays ready to receive a frame and of arrays
+        # holding a frame to encode, None to stop the worker
+        self._free = Queue()
+        self._filled = Queue()
+        self._stream = None
+        self._worker = None
+
+    def _start(self, surface):
+        """ Allocate arrays for frames of surface, open output and start
+        worker. Return False if output can't be written """
+        try:
+            if self.raw:
+                self._stream = open(str(self.output), "wb")
+            else:
+                self.output.mkdir(parents=True, exist_ok=True)
+        except OSError as error:
+            print(error)
+            self.error = error
+            return False
+        self.size = surface.get_size()
+        # Arrays hold frames row after row like surface memory, so
+        # copies are not transposed. 32 bits pixels are copied as they
+        # are, much faster than picking their colors, left to worker
+        shifts = surface.get_shifts()[:3]
+        if surface.get_bytesize() == 4 and all(
+            shift % 8 == 0 for shift in shifts
+        ):
+            self._channels = [
+                shift // 8 if sys.byteorder == "little" else 3 - shift // 8
+                for shift in shifts
+            ]
+            shape = (self.size[1], self.size[0])
+            dtype = np.uint32
+        else:
+            shape = (self.size[1], self.size[0], 3)
+            dtype = np.uint8
+        self._slots = np.empty((self._slots_count,) + shape, dtype=dtype)
+        for slot in range(self._slots_count):
+            self._free.put(slot)
+        self._worker = threading.Thread(
+            target=self._encode, name="capture", daemon=True
+        )
+        self._worker.start()
+        return True
+
+    def capture(self, surface):
+        """ Copy pixels of surface to be encoded, without waiting
+        unless self.wait. Return False if frame is dropped """
+        self.frames += 1
+        if (self.frames - 1) % self.every:
+            return True
+        if self.error is not None:
+            return False
+        if self._slots is None and not self._start(surface):
+            return False
+        # Frames of another size can't be part of the same video
+        if surface.get_size() != self.size:
+            self.dropped += 1
+            return False
+        try:
+            slot = self._free.get(self.wait)
+        except Empty:
+            self.dropped += 1
+            return False
+        # Pixels are read through a view on surface, locked until
+        # the view is deleted, and copied once in the ring. surfarray
+        # views are indexed by x then y
+        if self._channels is not None:
+            pixels = pygame.surfarray.pixels2d(surface)
+        else:
+            pixels = pygame.surfarray.pixels3d(surface)
+        np.copyto(self._slots[slot], pixels.swapaxes(0, 1))
+        del pixels
+        self._filled.put(slot)
+        self.captured += 1
+        return True
+
+    def _encode(self):
+        """ Write frames of filled arrays in order, in worker thread """
+        while True:
+            slot = self._filled.get()
+            if slot is None:
+                return
+            try:
+                # Frames left after an error are only released
+                if self.error is None:
+                    self._write(self._slots[slot])
+            except (OSError, ValueError) as error:
+                self.error = error
+            finally:
+                self._free.put(slot)
+
+    def _write(self, frame):
+        """ Encode frame, an array of a slot """
+        pixels = self._rgb(frame)
+        if self.raw:
+            self._stream.write(pixels)
+        else:
+            write_png(
+                self.output / f"frame_{self.written:06d}.png", pixels
+            )
+        self.written += 1
+
+    def _rgb(self, frame):
+        """ Return array of shape (height, width, 3) of RGB colors
+        of pixels of frame """
+        if self._channels is None:
+            return frame
+        pixels = frame.view(np.uint8).reshape(frame.shape + (4,))
+        # Copy channel by channel is faster than fancy indexing
+        rgb = np.empty(frame.shape + (3,), dtype=np.uint8)
+        for index, channel in enumerate(self._channels):
+            rgb[..., index] = pixels[..., channel]
+        return rgb
+
+    def close(self):
+        """ Wait until captured frames are written and stop worker """
+        if self._worker is not None:
+            self._filled.put(None)
+            self._worker.join()
+            self._worker = None
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def summary(self):
+        """ Return description of capture as a string """
+        text = (
+            f"{self.written} frames written in {self.output},"
+            + f" {self.dropped} dropped"
+        )
+        if self.error is not None:
+            text += f", stopped by error: {self.error}"
+        if self.raw and self.size is not None:
+            text += (
+                "\nencode with: ffmpeg -f rawvideo -pix_fmt rgb24"
+                + f" -s {self.size[0]}x{self.size[1]} -r {self.fps:g}"
+                + f" -i {self.output} video.mp4"
+            )
+        return text
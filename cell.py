@@ -1,36 +1,38 @@
-""" Module Cell class, inherit from pygame Sprite
+""" Module Cell class, inherit from pygame DirtySprite
 and add some module used during this game"""
 import pygame
 
 import constant
 
 
-class Cell(pygame.sprite.Sprite):
-    """Enhanced Sprite with functions to ease computation"""
+class Cell(pygame.sprite.DirtySprite):
+    """Enhanced Sprite with functions to ease computation.
+    Position is kept in maze referential and rect is the position
+    on screen, shifted by offset of the camera.
+    Any change of position flag the sprite as dirty to be redrawn"""
 
     def __init__(self, img, pos):
         super().__init__()
         self.image = img
         self.rect = self.image.get_rect()
-        self.rect.topleft = (
-            pos[0] * constant.SPRITE_W,
-            pos[1] * constant.SPRITE_H,
-        )
-        self.image.set_colorkey(constant.BLACK)
+        # Pixel position of camera, (0, 0) for sprite fixed on screen
+        self.offset = (0, 0)
+        self._pixel = (0, 0)
+        self.pos = pos
 
     @property
     def pos(self):
         """Return tuple position of sprite after conversion from pixel
         to index referential"""
         return (
-            self.rect.topleft[0] // constant.SPRITE_W,
-            self.rect.topleft[1] // constant.SPRITE_H,
+            self._pixel[0] // constant.SPRITE_W,
+            self._pixel[1] // constant.SPRITE_H,
         )
 
     @pos.setter
     def pos(self, pos):
         """Set position of sprite in pixel from index tuple"""
-        self.rect.topleft = (
+        self.pos_pixel = (
             pos[0] * constant.SPRITE_W,
             pos[1] * constant.SPRITE_H,
         )
@@ -38,9 +40,30 @@ class Cell(pygame.sprite.Sprite):
     @property
     def pos_pixel(self):
         """Return position in pixel"""
-        return self.rect.topleft
+        return self._pixel
 
     @pos_pixel.setter
     def pos_pixel(self, pos):
         """Set position of sprite in pixel"""
-        self.rect.topleft = (pos[0], pos[1])
+        self._pixel = (pos[0], pos[1])
+        self.rect.topleft = (
+            pos[0] - self.offset[0],
+            pos[1] - self.offset[1],
+        )
+        self.dirty = 1
+
+    def interpolate(self, alpha):
+        """Return pixel position to display at alpha fraction of
+        next logic step, a Cell is not moving by itself"""
+        return self._pixel
+
+    def place(self, offset, alpha=1.0):
+        """Move sprite on screen for a camera at offset pixel position,
+        at alpha fraction of next logic step.
+        Sprite is flagged dirty only if it moved on screen"""
+        self.offset = offset
+        pixel = self.interpolate(alpha)
+        topleft = (pixel[0] - offset[0], pixel[1] - offset[1])
+        if topleft != self.rect.topleft:
+            self.rect.topleft = topleft
+            self.dirty = 1
@@ -0,0 +1,260 @@
+""" Client of session server, and load test playing many random games
+at once through it, for example:
+
+    python client.py --sessions 1000 --ticks 500 --batch 10
+    python client.py --unix /tmp/maze.sock --connections 4
+
+Without --unix nor --port, a server is started inside this process
+on a free loopback port, so everything runs locally """
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter, deque
+
+import constant
+from agents import DIRECTIONS
+from level import Level
+from server import (
+    CLOSE,
+    ERROR,
+    LINE_LIMIT,
+    METRICS,
+    NEW,
+    RESET,
+    RESULT,
+    STEP,
+    SessionServer,
+    percentile,
+)
+
+# Names of fields of game state sent by server
+STATE_FIELDS = ["status", "steps", "x", "y", "collected", "guardians_left"]
+METRICS_FIELDS = ["requests", "ticks", "mean", "p50", "p99", "max"]
+
+
+class Client:
+    """ Connection to a session server. Many tasks can send requests
+    at once, they are written without waiting for previous responses
+    and each task gets its own response """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        # Futures of requests waiting for their response, in order,
+        # with time they were sent
+        self._waiting = deque()
+        # Round trip time of each request in seconds
+        self.latencies = []
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect(cls, port=None, path=None):
+        """ Connect to server listening on unix socket path if given,
+        else on loopback port, constant.SERVER_PORT by default """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(
+                path, limit=LINE_LIMIT
+            )
+        else:
+            if port is None:
+                port = constant.SERVER_PORT
+            reader, writer = await asyncio.open_connection(
+                constant.SERVER_HOST, port, limit=LINE_LIMIT
+            )
+        return cls(reader, writer)
+
+    async def _receive(self):
+        """ Give each response to oldest waiting request """
+        while True:
+            try:
+                line = await self._reader.readline()
+            except ConnectionError:
+                break
+            if not line:
+                break
+            future, sent = self._waiting.popleft()
+            self.latencies.append(time.perf_counter() - sent)
+            if not future.cancelled():
+                future.set_result(line.decode().rstrip("\n"))
+        while self._waiting:
+            future, sent = self._waiting.popleft()
+            if not future.cancelled():
+                future.set_exception(ConnectionError("connection closed"))
+
+    async def request(self, *fields):
+        """ Send request made of fields and return fields of response
+        after command and game id. Raise RuntimeError if server
+        answer with an error """
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append((future, time.perf_counter()))
+        self._writer.write(" ".join(str(field) for field in fields).encode())
+        self._writer.write(b"\n")
+        await self._writer.drain()
+        response = await future
+        if response.startswith(ERROR):
+            raise RuntimeError(response.split(" ", 1)[-1])
+        return response.split(" ", 2)[1:]
+
+    async def _state(self, *fields):
+        """ Send request answered by a game state, return game id
+        and state as a dict """
+        session_id, state = await self.request(*fields)
+        return (
+            int(session_id),
+            dict(zip(STATE_FIELDS, map(int, state.split()))),
+        )
+
+    async def new(self, seed=None):
+        """ Start a new game, return its id and state """
+        if seed is None:
+            return await self._state(NEW)
+        return await self._state(NEW, seed)
+
+    async def step(self, session_id, actions):
+        """ Play actions, an iterable of constant.ACTIONS, return state """
+        actions = "".join(str(action) for action in actions)
+        return (await self._state(STEP, session_id, actions))[1]
+
+    async def reset(self, session_id, seed=None):
+        """ Restart game, return its state """
+        if seed is None:
+            return (await self._state(RESET, session_id))[1]
+        return (await self._state(RESET, session_id, seed))[1]
+
+    async def result(self, session_id):
+        """ Return final result text of finished game """
+        return (await self.request(RESULT, session_id))[1]
+
+    async def metrics(self, session_id):
+        """ Return metrics of game as a dict, latencies
+        in microseconds """
+        values = (await self.request(METRICS, session_id))[1].split()
+        return dict(zip(METRICS_FIELDS, map(float, values)))
+
+    async def close_session(self, session_id):
+        await self.request(CLOSE, session_id)
+
+    async def close(self):
+        """ Close connection, server closes games created by it """
+        self._writer.close()
+        await self._receiver
+
+
+async def play(client, seed, ticks, batch):
+    """ Play a game of random moves sent by batch of actions, at most
+    ticks actions. Return its result and metrics """
+    rng = random.Random(seed)
+    session_id, state = await client.new(seed)
+    while state["status"] == constant.PLAY and state["steps"] < ticks:
+        size = min(batch, ticks - state["steps"])
+        state = await client.step(
+            session_id, [rng.choice(DIRECTIONS) for _ in range(size)]
+        )
+    if state["status"] == constant.PLAY:
+        result = "timeout"
+    else:
+        result = await client.result(session_id)
+    metrics = await client.metrics(session_id)
+    await client.close_session(session_id)
+    return result, metrics
+
+
+async def load_test(args, port=None, path=None):
+    """ Play args.sessions games at once spread over args.connections
+    connections and return report as a string """
+    clients = [
+        await Client.connect(port, path) for _ in range(args.connections)
+    ]
+    start = time.perf_counter()
+    games = await asyncio.gather(
+        *(
+            play(
+                clients[index % len(clients)],
+                args.seed + index,
+                args.ticks,
+                args.batch,
+            )
+            for index in range(args.sessions)
+        )
+    )
+    duration = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+
+    results = Counter(result for result, metrics in games)
+    ticks = sum(metrics["ticks"] for result, metrics in games)
+    requests = sum(metrics["requests"] for result, metrics in games)
+    round_trips = sorted(
+        latency for client in clients for latency in client.latencies
+    )
+    # Server time of requests, worst game first
+    worst = sorted(
+        (metrics["p99"] for result, metrics in games), reverse=True
+    )
+    lines = [
+        f"{args.sessions} games, {int(ticks)} ticks and {int(requests)}"
+        + f" requests in {duration:.3f} s",
+        f"{ticks / duration:.0f} ticks/s, {requests / duration:.0f}"
+        + " requests/s",
+        "round trip ms: p50 {:.3f} p99 {:.3f} max {:.3f}".format(
+            percentile(round_trips, 0.5) * 1000,
+            percentile(round_trips, 0.99) * 1000,
+            round_trips[-1] * 1000,
+        ),
+        "server us per request: mean {:.1f}, worst game p99 {:.1f}".format(
+            sum(metrics["mean"] for result, metrics in games) / len(games),
+            worst[0],
+        ),
+    ]
+    for result, count in results.most_common():
+        lines.append(f"{result}: {count}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Play random games through a session server"
+    )
+    parser.add_argument(
+        "maze", nargs="?", help="maze of server started by client"
+    )
+    parser.add_argument("--port", type=int, help="port of running server")
+    parser.add_argument("--unix", help="unix socket of running server")
+    parser.add_argument(
+        "--guardians",
+        choices=constant.GUARDIAN_MODES,
+        help="guardians of server started by client",
+    )
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=1)
+    parser.add_argument(
+        "--ticks", type=int, default=500, help="maximum ticks per game"
+    )
+    parser.add_argument(
+        "--batch", type=int, default=10, help="ticks per step request"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+async def main(args):
+    """ Run load test, against a server started here unless one is
+    given. Return False if it can't be done """
+    if args.port is not None or args.unix is not None:
+        print(await load_test(args, args.port, args.unix))
+        return True
+    level = Level.load(args.maze)
+    if level is None:
+        return False
+    server = SessionServer(level, args.guardians, args.sessions)
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        print(await load_test(args, port))
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main(parse_args())) else 1)
@@ -14,10 +14,41 @@ PAUSE = 4
 # Game initialize again game for a new try
 RESTART = 5
 
-FPS = 30
+# Game logic advance by fixed steps, TICK_RATE times per second
+TICK_RATE = 30
+# Logic steps done at most before each display when game is late
+MAX_TICKS_PER_FRAME = 5
+# Maximum frame rate of display, 0 for uncapped,
+# and synchronization with screen refresh
+FPS = 60
+VSYNC = False
+# Frame timings kept by profiler, overlay refreshed every
+# PROFILE_REFRESH frames and displayed at start if SHOW_PROFILER
+# (F3 key toggle it during game)
+PROFILE_FRAMES = 1000
+PROFILE_REFRESH = 15
+PROFILE_SIZE = 14
+SHOW_PROFILER = False
+# State of game is saved in replays every REPLAY_CHECKPOINT ticks
+# to seek quickly inside them
+REPLAY_CHECKPOINT = 300
+# Time in second the result is displayed at end of game
+FINISH_DELAY = 1
+# Only push changed area of screen to display each frame,
+# set to False to fall back to full screen flip
+DIRTY_RECTS = True
 
 # Dimension of maze and sprites
+# Maze width used if not given in data file
 MAZE_SIZE = 15
+# Maximum part of maze visible on screen in number of cells,
+# the camera follow player inside larger mazes
+VIEW_W = 15
+VIEW_H = 15
+# Maze tiles are pre-rendered by square chunks of CHUNK_SIZE cells,
+# at most MAX_CHUNKS chunks are kept in memory
+CHUNK_SIZE = 16
+MAX_CHUNKS = 16
 SPRITE_H = 40
 SPRITE_W = 40
 # optional space in height of width direction
@@ -26,10 +57,44 @@ SPRITE_W = 40
 OPTIONAL_H = 1
 OPTIONAL_W = 0
 
+# Tile types of maze grid
+WALL = 0
+FLOOR = 1
+
+# Actions of player, and displacement they imply
+STAY = 0
+LEFT = 1
+RIGHT = 2
+UP = 3
+DOWN = 4
+ACTIONS = [STAY, LEFT, RIGHT, UP, DOWN]
+MOVES = {
+    STAY: (0, 0),
+    LEFT: (-1, 0),
+    RIGHT: (1, 0),
+    UP: (0, -1),
+    DOWN: (0, 1),
+}
+
+# Distance fields kept in memory by each pathfinder
+# and pathfinders kept for different maze layouts
+MAX_DISTANCE_FIELDS = 64
+MAX_PATHFINDERS = 8
+
+# Behaviour of guardians, they move one cell each time player moves:
+# stay on their cell, patrol along corridors, or chase player when
+# less than CHASE_RADIUS steps away and patrol otherwise
+STATIC = "static"
+PATROL = "patrol"
+CHASE = "chase"
+GUARDIAN_MODES = [STATIC, PATROL, CHASE]
+GUARDIAN_MODE = STATIC
+CHASE_RADIUS = 12
+
 # Life status for player and Guardian
 DEAD = 0
 ALIVE = 1
-# Speed (pixel per clock loop) of player during displacements
+# Speed (pixel per logic step) of player during displacements
 SPEED = 8
 
 # Colors for screen display
@@ -42,6 +107,22 @@ BRIGHT_GREEN = (0, 255, 0)
 
 # Ressource folder
 RESSOURCE_FOLDER = Path(".") / "ressources"
+# Extension of levels saved in binary format
+LEVEL_SUFFIX = ".mgl"
+# Extension of files packing many levels, played one after the other.
+# PREFETCH_LEVELS next levels are prepared in background while playing
+PACK_SUFFIX = ".mgp"
+PREFETCH_LEVELS = 2
+# Files of level watched for modification every HOT_RELOAD_INTERVAL
+# seconds when hot reload is enabled. With CHECK_HOT_RELOAD, items
+# placement is compared to a search of the whole maze after each
+# reload, which is slow on large mazes
+HOT_RELOAD_INTERVAL = 0.5
+CHECK_HOT_RELOAD = False
+# Converted images are cached in this folder,
+# packed in atlas of at most ATLAS_WIDTH pixel width
+ASSET_CACHE = RESSOURCE_FOLDER / ".cache"
+ATLAS_WIDTH = 1024
 # image used as objects during game
 ITEMS = ["plastic_tube", "ether", "needle"]
 WEAPON = "syringe"
@@ -55,3 +136,19 @@ SMALL_FONT = "comicsansms"
 SMALL_SIZE = 25
 BIG_FONT = "freesansbold.ttf"
 BIG_SIZE = 70
+# Number of rendered texts kept in memory
+TEXT_CACHE_SIZE = 64
+
+# Frames of captured video per second, also frame rate of headless
+# games, and frames waiting for encoding at most
+CAPTURE_FPS = 60
+CAPTURE_SLOTS = 16
+
+# Session server hosting headless games, only reachable from this host.
+# A request steps a session of at most SERVER_MAX_BATCH ticks and
+# latency of the last LATENCY_WINDOW requests of a session is kept
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_MAX_SESSIONS = 10000
+SERVER_MAX_BATCH = 1024
+LATENCY_WINDOW = 256
@@ -1,5 +1,8 @@
 """ Module for class to display informative object on screen """
 
+import threading
+from collections import OrderedDict
+
 import pygame
 
 import constant
@@ -7,7 +10,8 @@ import constant
 
 class Button:
     """ Interactive button link with different color for hover
-    and return if it had been clicked during display """
+    and return if it had been clicked during display.
+    Button is only redrawn when its hover status change """
 
     def __init__(self, pos, color, color_hover, message):
         """ Initialize a rect object, colors and
@@ -27,6 +31,12 @@ class Button:
             constant.BIG_FONT,
             constant.BLACK,
         )
+        # Hover status of last display, None to force next display
+        self.hover = None
+
+    def invalidate(self):
+        """ Force button to be redrawn during next display """
+        self.hover = None
 
     def _contain(self, pos):
         """ return is Button instance contain the position pos """
@@ -39,28 +49,94 @@ class Button:
             return True
         return False
 
-    def display(self, screen):
+    def display(self, screen, rects=None):
         """ Display button depending on mouse position
-        if clicked, return True, False otherwise """
+        if clicked, return True, False otherwise.
+        Button is drawn only if hover status changed since last display
+        and drawn area is then added to rects list if provided """
         mouse_pos = pygame.mouse.get_pos()
         clicked = pygame.mouse.get_pressed()
-        if self.rect.collidepoint(mouse_pos):
-            pygame.draw.rect(screen, self.color_hover, self.rect)
-            self.message.display(screen)
-            if clicked[0]:
-                return True
-        else:
-            pygame.draw.rect(screen, self.color, self.rect)
+        hover = self.rect.collidepoint(mouse_pos)
+        if hover != self.hover:
+            self.hover = hover
+            if hover:
+                pygame.draw.rect(screen, self.color_hover, self.rect)
+            else:
+                pygame.draw.rect(screen, self.color, self.rect)
             self.message.display(screen)
+            if rects is not None:
+                rects.append(self.rect)
+        if hover and clicked[0]:
+            return True
         return False
 
 
+class TextCache:
+    """ Shared fonts and rendered text surfaces keyed on
+    (text, font, size, color). Least recently used surfaces are
+    dropped above max_size entries.
+    Texts can be rendered from several threads """
+
+    def __init__(self, max_size=constant.TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Font registry avoid a scan of system fonts for each text
+        self._fonts = {}
+        self._surfaces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def font(self, font, size):
+        """ Return pygame Font object of font name and size """
+        key = (font, size)
+        if key not in self._fonts:
+            self._fonts[key] = pygame.font.SysFont(font, size)
+        return self._fonts[key]
+
+    def render(self, text, font, size, color):
+        """ Return surface of text rendered with font, size and color.
+        Returned surface is shared and must not be modified """
+        key = (text, font, size, tuple(color))
+        with self._lock:
+            surface = self._surfaces.get(key)
+            if surface is not None:
+                self.hits += 1
+                self._surfaces.move_to_end(key)
+                return surface
+
+            self.misses += 1
+            surface = self.font(font, size).render(text, True, color)
+            self._surfaces[key] = surface
+            while len(self._surfaces) > self.max_size:
+                self._surfaces.popitem(last=False)
+            return surface
+
+    def clear(self):
+        """ Drop all rendered texts and fonts """
+        self._surfaces.clear()
+        self._fonts.clear()
+
+    @property
+    def stats(self):
+        """ Return dict of cache usage to help choosing its size """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._surfaces),
+            "max_size": self.max_size,
+            "fonts": len(self._fonts),
+        }
+
+
+# Cache shared by all messages
+text_cache = TextCache()
+
+
 class Message:
     """ Set a message to be displayed with 2 possible size: Big and Small """
 
     def __init__(self, pos, text, size, font, color):
-        self.font = pygame.font.SysFont(font, size)
-        self.textSurface = self.font.render(text, True, color)
+        self.textSurface = text_cache.render(text, font, size, color)
         self.rect = self.textSurface.get_rect()
         self.rect.center = pos
 
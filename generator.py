@@ -0,0 +1,178 @@
+""" Procedural generation of levels of any size, fully determined
+by a seed, in the same structure than data.json levels:
+
+    python generator.py 41 41 --seed 3 --output maze.json
+    python generator.py 4001 4001 --output big.mgl
+    python generator.py 15 15 --count 10000 --output levels.mgp
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import constant
+from grid import Grid
+from level import Level, save_pack
+
+# Images needed to display a generated level
+SPRITES = [
+    "wall",
+    "floor",
+    "player",
+    "guardian",
+    constant.ARROW_NAME,
+    constant.WEAPON,
+] + constant.ITEMS
+
+
+def carve(width, height, rng):
+    """ Return array of shape (height, width) of tile types of a perfect
+    maze carved by sidewinder algorithm with rng, a numpy Generator.
+    Maze cells are at odd coordinates and walls between them are
+    opened to link cells. Rows are independent with sidewinder, so all
+    rows are carved at once """
+    cells_w = (width - 1) // 2
+    cells_h = (height - 1) // 2
+    if cells_w < 1 or cells_h < 1:
+        raise ValueError(f"maze of {width}x{height} is too small")
+    rows_end = 2 * cells_h
+    columns_end = 2 * cells_w
+    tiles = np.full((height, width), constant.WALL, dtype=np.uint8)
+    tiles[1:rows_end:2, 1:columns_end:2] = constant.FLOOR
+
+    # Passage to east cell, always open on first row
+    east = rng.random((cells_h, cells_w - 1), dtype=np.float32) < 0.5
+    east[0] = True
+    tiles[1:rows_end:2, 2:columns_end:2][east] = constant.FLOOR
+
+    # Below first row, each run of cells linked east is linked north
+    # by one of its cells drawn at random
+    starts = np.ones((cells_h - 1, cells_w), dtype=bool)
+    starts[:, 1:] = ~east[1:]
+    starts = np.flatnonzero(starts)
+    lengths = np.diff(starts, append=(cells_h - 1) * cells_w)
+    chosen = starts + (rng.random(len(starts)) * lengths).astype(np.int64)
+    tiles[2 * (chosen // cells_w + 1), 2 * (chosen % cells_w) + 1] = (
+        constant.FLOOR
+    )
+    return tiles
+
+
+def dead_ends(tiles):
+    """ Return flat indexes of maze cells of tiles, at odd coordinates,
+    with only one neighbour cell linked to them """
+    height, width = tiles.shape
+    rows_end = 2 * ((height - 1) // 2)
+    columns_end = 2 * ((width - 1) // 2)
+    # Walls around each cell, opened when cells are linked
+    north = tiles[:rows_end:2, 1:columns_end:2]
+    south = tiles[2:][:rows_end:2, 1:columns_end:2]
+    west = tiles[1:rows_end:2, :columns_end:2]
+    east = tiles[1:rows_end:2, 2:][:, :columns_end:2]
+    links = north + south + west + east
+    rows, columns = np.nonzero(links == constant.FLOOR)
+    return (2 * rows + 1) * width + 2 * columns + 1
+
+
+def generate(width, height, seed=None, guardians=1, items=None):
+    """ Return a Level of a random maze of width x height tiles.
+    Player starts in top left cell and guardians stand in dead ends,
+    the first one in the farthest from player, so they never cut
+    the maze. Same seed gives always the same level """
+    if items is None:
+        items = len(constant.ITEMS)
+    rng = np.random.default_rng(seed)
+    tiles = carve(width, height, rng)
+    player = (1, 1)
+
+    ends = dead_ends(tiles)
+    ends = ends[ends != width + 1]
+    if len(ends) < guardians:
+        raise ValueError(
+            f"Only {len(ends)} dead ends for {guardians} guardians"
+        )
+    farthest = np.argmax(ends % width + ends // width)
+    others = np.delete(ends, farthest)
+    chosen = [ends[farthest]] + list(
+        rng.choice(others, guardians - 1, replace=False)
+    )
+
+    grid = Grid(width, height, tiles.reshape(-1), copy=False)
+    return Level(
+        grid,
+        player,
+        [grid.pos(int(index)) for index in chosen],
+        SPRITES,
+        items,
+    )
+
+
+def generate_many(width, height, count, seed=None, guardians=1, items=None):
+    """ Iterate over count levels, each one with a seed derived
+    from seed """
+    for child in np.random.SeedSequence(seed).spawn(count):
+        yield generate(width, height, child, guardians, items)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate random mazes")
+    parser.add_argument("width", type=int, help="width in tiles, odd")
+    parser.add_argument("height", type=int, help="height in tiles, odd")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--guardians", type=int, default=1)
+    parser.add_argument("--items", type=int, default=len(constant.ITEMS))
+    parser.add_argument(
+        "--count",
+        type=int,
+        help="number of levels written in a level pack",
+    )
+    parser.add_argument(
+        "--output",
+        required=True,
+        help=f"json, {constant.LEVEL_SUFFIX} level"
+        + f" or {constant.PACK_SUFFIX} level pack file",
+    )
+    return parser.parse_args(argv)
+
+
+def main(args):
+    """ Write levels asked by command line arguments,
+    return False if they can't be generated """
+    output = Path(args.output)
+    start = time.perf_counter()
+    try:
+        if args.count is not None:
+            count = save_pack(
+                generate_many(
+                    args.width,
+                    args.height,
+                    args.count,
+                    args.seed,
+                    args.guardians,
+                    args.items,
+                ),
+                output,
+            )
+        else:
+            count = 1
+            level = generate(
+                args.width, args.height, args.seed, args.guardians, args.items
+            )
+            if output.suffix == ".json":
+                with open(output, "w") as json_file:
+                    json.dump(level.to_data(), json_file)
+            else:
+                level.save(output)
+    except ValueError as error:
+        print(error)
+        return False
+    duration = time.perf_counter() - start
+    print(f"{count} levels written in {output} in {duration:.3f} s")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(parse_args()) else 1)
@@ -0,0 +1,150 @@
+""" Contain Grid class, compact storage of maze tiles
+independent of any pygame object """
+import hashlib
+from array import array
+
+import constant
+
+# Number of tiles compared at once when looking for changed tiles
+DIFF_BLOCK = 4096
+
+
+class Grid:
+    """ Maze tiles stored as one byte per cell, row after row,
+    to answer walkability queries without sprites lookup """
+
+    def __init__(self, width, height, tiles, copy=True):
+        """ tiles is a bytes-like object of width * height tile types.
+        With copy False, tiles buffer is used directly without copy
+        and must be writable to change the grid """
+        if len(tiles) != width * height:
+            raise ValueError(
+                f"Grid of {width}x{height} need {width * height} tiles,"
+                + f" got {len(tiles)}"
+            )
+        self.width = width
+        self.height = height
+        self._tiles = bytearray(tiles) if copy else memoryview(tiles)
+        # Incremented at each change of layout
+        self.version = 0
+        self._key = None
+
+    @classmethod
+    def from_data(cls, maze, width):
+        """ Build grid from the flat list of data.json file where
+        0 is a wall and any other value (1, "P", "G") a floor """
+        tiles = bytearray(
+            constant.FLOOR if val else constant.WALL for val in maze
+        )
+        return cls(width, len(maze) // width, tiles)
+
+    @property
+    def tiles(self):
+        """ View on tile types, row after row, without copy.
+        It must only be read, tiles are changed through Grid """
+        return memoryview(self._tiles)
+
+    @property
+    def layout_key(self):
+        """ Return a digest identifying the layout of the grid,
+        equal for grids with same dimensions and tiles """
+        if self._key is None or self._key[0] != self.version:
+            digest = hashlib.sha1(self._tiles)
+            digest.update(f"{self.width}x{self.height}".encode())
+            self._key = (self.version, digest.hexdigest())
+        return self._key[1]
+
+    def set(self, pos, tile):
+        """ Change type of tile at pos """
+        index = pos[1] * self.width + pos[0]
+        if self._tiles[index] != tile:
+            self._tiles[index] = tile
+            self.version += 1
+
+    def diff(self, other):
+        """ Return list of index of tiles different inside other grid
+        of same dimensions. Blocks of tiles are compared at once and
+        only the different ones are scanned tile by tile """
+        if (other.width, other.height) != (self.width, self.height):
+            raise ValueError("grids of different dimensions")
+        mine = self._tiles
+        theirs = other._tiles
+        changed = []
+        for start in range(0, len(mine), DIFF_BLOCK):
+            end = start + DIFF_BLOCK
+            block = bytes(mine[start:end])
+            other_block = bytes(theirs[start:end])
+            if block != other_block:
+                changed.extend(
+                    start + offset
+                    for offset, (tile, other_tile) in enumerate(
+                        zip(block, other_block)
+                    )
+                    if tile != other_tile
+                )
+        return changed
+
+    def index(self, pos):
+        """ Convert tuple position into index inside tiles """
+        return pos[1] * self.width + pos[0]
+
+    def pos(self, index):
+        """ Convert index inside tiles into tuple position """
+        return (index % self.width, index // self.width)
+
+    def contains(self, pos):
+        """ return if pos is inside grid limits """
+        return 0 <= pos[0] < self.width and 0 <= pos[1] < self.height
+
+    def is_walkable(self, pos):
+        """ return if pos cell can be walk in """
+        return (
+            0 <= pos[0] < self.width
+            and 0 <= pos[1] < self.height
+            and self._tiles[pos[1] * self.width + pos[0]] == constant.FLOOR
+        )
+
+    def walkable(self, positions):
+        """ Bulk version of is_walkable, return a list of boolean
+        in the same order than positions """
+        tiles = self._tiles
+        width = self.width
+        height = self.height
+        floor = constant.FLOOR
+        return [
+            0 <= x < width
+            and 0 <= y < height
+            and tiles[y * width + x] == floor
+            for x, y in positions
+        ]
+
+    def walkable_neighbours(self, pos):
+        """ Return walkable positions on left, right, top and bottom
+        of pos """
+        x, y = pos
+        return [
+            cell
+            for cell in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+            if self.is_walkable(cell)
+        ]
+
+    def floor_cells(self):
+        """ Return list of all walkable positions """
+        width = self.width
+        return [
+            (index % width, index // width)
+            for index, tile in enumerate(self._tiles)
+            if tile == constant.FLOOR
+        ]
+
+    def floor_indexes(self):
+        """ Return array of index of all walkable cells """
+        tiles = self._tiles
+        floor = constant.FLOOR
+        return array(
+            "q", (index for index, tile in enumerate(tiles) if tile == floor)
+        )
+
+    def __getitem__(self, pos):
+        """ Return tile type at pos """
+        return self._tiles[pos[1] * self.width + pos[0]]
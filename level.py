@@ -0,0 +1,310 @@
+""" Contain Level class, description of a maze loaded from data file
+independent of any pygame object """
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+import constant
+from grid import Grid
+
+# Binary level format: header, names of sprites separated by comma
+# then one byte per tile, row after row.
+# Since version 2, number of guardians and items follow the header
+# and position of other guardians follow sprites names
+MAGIC = b"MGLV"
+VERSION = 2
+# magic, version, reserved, width, height, player x, player y,
+# first guardian x, first guardian y, size of sprites names
+HEADER = struct.Struct("<4sHHIIIIIII")
+# number of guardians, number of items
+ENTITIES = struct.Struct("<II")
+# x, y of a guardian
+POSITION = struct.Struct("<II")
+
+# Level pack format: header, levels in binary format one after
+# the other, then offset of each level from start of file
+PACK_MAGIC = b"MGLP"
+PACK_VERSION = 1
+# magic, version, reserved, number of levels, offset of levels table
+PACK_HEADER = struct.Struct("<4sHHIQ")
+OFFSET = struct.Struct("<Q")
+
+
+class Level:
+    """ Grid of a maze with starting positions of player and guardians
+    and the number of items to collect """
+
+    def __init__(
+        self, grid, player, guardians, sprites=(), items=len(constant.ITEMS)
+    ):
+        self.grid = grid
+        self.player = player
+        self.guardians = list(guardians)
+        if not self.guardians:
+            raise ValueError("a level need at least one guardian")
+        # Name of images needed to display the level
+        self.sprites = list(sprites)
+        self.items = items
+
+    @property
+    def guardian(self):
+        """ Position of first guardian """
+        return self.guardians[0]
+
+    @classmethod
+    def from_data(cls, data):
+        """ Build level from content of a data.json like file """
+        maze = data["Maze"]
+        grid = Grid.from_data(maze, data.get("Width", constant.MAZE_SIZE))
+        return cls(
+            grid,
+            grid.pos(maze.index("P")),
+            [
+                grid.pos(index)
+                for index, tile in enumerate(maze)
+                if tile == "G"
+            ],
+            data.get("List of sprites", ()),
+            data.get("Items", len(constant.ITEMS)),
+        )
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        """ Build level from binary format stored in buffer at offset.
+        Grid tiles are a view on buffer, without copy """
+        (
+            magic,
+            version,
+            _,
+            width,
+            height,
+            player_x,
+            player_y,
+            guardian_x,
+            guardian_y,
+            sprites_size,
+        ) = HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC:
+            raise ValueError("not a level file")
+        if version not in (1, VERSION):
+            raise ValueError(f"unsupported level version {version}")
+
+        start = offset + HEADER.size
+        guardians_count = 1
+        items = len(constant.ITEMS)
+        if version >= 2:
+            guardians_count, items = ENTITIES.unpack_from(buffer, start)
+            start += ENTITIES.size
+
+        view = memoryview(buffer)
+        end = start + sprites_size
+        sprites = bytes(view[start:end]).decode()
+        start = end
+        end = start + (guardians_count - 1) * POSITION.size
+        guardians = [(guardian_x, guardian_y)]
+        guardians.extend(POSITION.iter_unpack(view[start:end]))
+        start = end
+        end = start + width * height
+        tiles = view[start:end]
+        return cls(
+            Grid(width, height, tiles, copy=False),
+            (player_x, player_y),
+            guardians,
+            sprites.split(",") if sprites else (),
+            items,
+        )
+
+    def to_data(self):
+        """ Return level as the content of a data.json like file """
+        maze = list(self.grid.tiles)
+        maze[self.grid.index(self.player)] = "P"
+        for pos in self.guardians:
+            maze[self.grid.index(pos)] = "G"
+        return {
+            "Maze": maze,
+            "Width": self.grid.width,
+            "Items": self.items,
+            "List of sprites": self.sprites,
+        }
+
+    def to_bytes(self):
+        """ Return level in binary format """
+        sprites = ",".join(self.sprites).encode()
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            0,
+            self.grid.width,
+            self.grid.height,
+            self.player[0],
+            self.player[1],
+            self.guardian[0],
+            self.guardian[1],
+            len(sprites),
+        )
+        entities = ENTITIES.pack(len(self.guardians), self.items)
+        guardians = b"".join(POSITION.pack(*pos) for pos in self.guardians[1:])
+        return header + entities + sprites + guardians + bytes(self.grid.tiles)
+
+    def save(self, level_file):
+        """ Write level in binary format inside level_file.
+        File is replaced at once, so levels still mapping the previous
+        file keep their content """
+        temporary = f"{level_file}.tmp"
+        with open(temporary, "wb") as binary_file:
+            binary_file.write(self.to_bytes())
+        os.replace(temporary, str(level_file))
+
+    @classmethod
+    def load(cls, data_file=None):
+        """ Load level inside data_file, data.json file by default,
+        return None if file can't be used.
+        Files with constant.LEVEL_SUFFIX are read in binary format """
+        if data_file is not None and (
+            Path(data_file).suffix == constant.LEVEL_SUFFIX
+        ):
+            return cls._load_binary(data_file)
+
+        data = load_data(data_file)
+        if data is None:
+            return
+        try:
+            return cls.from_data(data)
+        except (KeyError, ValueError) as error:
+            print(f"error while attempting to read {error} from {data_file}")
+            return
+
+    @classmethod
+    def _load_binary(cls, level_file):
+        """ Memory map level_file and return its level. Pages of the
+        file are shared until a tile is modified """
+        try:
+            with open(str(level_file), "rb") as binary_file:
+                mapped = mmap.mmap(
+                    binary_file.fileno(), 0, access=mmap.ACCESS_COPY
+                )
+        except (OSError, ValueError) as error:
+            print(error)
+            print("Please check ressource folder before playing Game")
+            return
+
+        try:
+            return cls.from_buffer(mapped)
+        except (struct.error, ValueError) as error:
+            print(f"error while attempting to read {level_file}: {error}")
+            return
+
+
+class LevelPack:
+    """ Sequence of levels stored in one memory mapped file,
+    each level is only read when accessed """
+
+    def __init__(self, buffer):
+        """ buffer contains a level pack """
+        magic, version, _, count, table = PACK_HEADER.unpack_from(buffer)
+        if magic != PACK_MAGIC:
+            raise ValueError("not a level pack file")
+        if version != PACK_VERSION:
+            raise ValueError(f"unsupported level pack version {version}")
+        self._buffer = buffer
+        self._count = count
+        self._table = table
+
+    @classmethod
+    def load(cls, pack_file):
+        """ Memory map pack_file and return its LevelPack,
+        None if file can't be used """
+        try:
+            with open(str(pack_file), "rb") as binary_file:
+                mapped = mmap.mmap(
+                    binary_file.fileno(), 0, access=mmap.ACCESS_COPY
+                )
+        except (OSError, ValueError) as error:
+            print(error)
+            return
+
+        try:
+            return cls(mapped)
+        except (struct.error, ValueError) as error:
+            print(f"error while attempting to read {pack_file}: {error}")
+            return
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        """ Return level at index, its grid is a view on the pack """
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("level index out of range")
+        (offset,) = OFFSET.unpack_from(
+            self._buffer, self._table + index * OFFSET.size
+        )
+        return Level.from_buffer(self._buffer, offset)
+
+
+def save_pack(levels, pack_file):
+    """ Write levels of an iterable in a level pack file, one at a time
+    so that the whole pack is never in memory.
+    Return the number of levels written """
+    temporary = f"{pack_file}.tmp"
+    offsets = []
+    with open(temporary, "wb") as binary_file:
+        binary_file.write(bytes(PACK_HEADER.size))
+        for level in levels:
+            offsets.append(binary_file.tell())
+            binary_file.write(level.to_bytes())
+        table = binary_file.tell()
+        binary_file.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+        binary_file.seek(0)
+        binary_file.write(
+            PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, len(offsets), table)
+        )
+    os.replace(temporary, str(pack_file))
+    return len(offsets)
+
+
+def load_data(data_file=None):
+    """ Load Game information inside data_file,
+    data.json file by default, and return it """
+    if data_file is None:
+        data_file = constant.RESSOURCE_FOLDER / "data.json"
+    try:
+        with open(str(data_file), "r") as json_file:
+            data = json.load(json_file)
+
+        return data
+
+    except (FileNotFoundError, FileExistsError) as error:
+        print(error)
+        print("Please check ressource folder before playing Game")
+        return
+
+    except KeyError as error:
+        print(f"error while attempting to read {error}" + "from data.jon file")
+        return
+
+    except ValueError as error:
+        print(f"{data_file} is not a valid json file: {error}")
+        return
+
+
+def convert(data_file, level_file):
+    """ Convert a data.json like file into binary level format """
+    level = Level.load(data_file)
+    if level is None:
+        return False
+    level.save(level_file)
+    return True
+
+
+if __name__ == "__main__":
+    # Usage: python level.py data.json level.mgl
+    if len(sys.argv) != 3:
+        print("Usage: python level.py <data.json> <level.mgl>")
+        sys.exit(1)
+    sys.exit(0 if convert(sys.argv[1], sys.argv[2]) else 1)
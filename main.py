@@ -1,40 +1,162 @@
+import argparse
+import os
 import pygame
+import sys
 import time
+from pathlib import Path
 
 import constant
+from agents import AGENTS, make_agent
 from maze import Maze
 from display import Button, Message
+from level import LevelPack
+from profiler import FrameProfiler
+from progression import Progression
+from replay import Replay
+from watcher import FileWatcher
+
+# Duration of a step of game logic in second
+TICK_TIME = 1 / constant.TICK_RATE
 
 
 class Game:
     """ Class managing the state machine and general information of the Game"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        data_file=None,
+        trace_file=None,
+        record_file=None,
+        guardian_mode=None,
+        prefetch=None,
+        watch=False,
+        capture=None,
+        headless=False,
+    ):
         """ init pygame screen, maze object for gameplay and all preset button
-        and message to be display on screen"""
-        # Initialize Pygame basics
+        and message to be display on screen.
+        data_file can be a level pack, its levels are then played in
+        order with prefetch levels prepared in advance.
+        Frame timings are written in trace_file on exit if given,
+        and replay of last game played in record_file.
+        guardian_mode tells how guardians move and with watch,
+        maze is reloaded when its files are modified.
+        Each frame is given to capture, a FrameCapture instance, if given.
+        A headless game has no window and renders frames as fast as
+        possible, its time advances of one frame at constant.CAPTURE_FPS
+        per loop whatever the real time taken """
+        # Time of launch to measure time to first frame
+        self.start_time = time.perf_counter()
+        self.first_frame_time = None
+        self.headless = headless
+        self.capture = capture
+        # Frames rendered, clock of headless games
+        self.frames = 0
+        # Initialize Pygame basics, without any display when headless
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
         pygame.init()
         self.width = (
-            constant.MAZE_SIZE + constant.OPTIONAL_W
+            constant.VIEW_W + constant.OPTIONAL_W
         ) * constant.SPRITE_W
         self.height = (
-            constant.MAZE_SIZE + constant.OPTIONAL_H
+            constant.VIEW_H + constant.OPTIONAL_H
         ) * constant.SPRITE_H
 
-        self.screen = pygame.display.set_mode((self.width, self.height))
+        self.screen = self._set_mode()
         pygame.display.set_caption("Mac Gyver Escape")
         self.clock = pygame.time.Clock()
 
+        self.status = constant.MENU
+        # Status displayed during previous loop, to detect when
+        # the whole screen must be redrawn
+        self._displayed_status = None
+        self._redraw = True
+        # Time not yet simulated by game logic
+        self._lag = 0
+        # Time and status of next timed status change
+        self._transition = None
+        # Timing of frame stages during play
+        self.profiler = FrameProfiler()
+        self.show_profiler = constant.SHOW_PROFILER
+        self.trace_file = trace_file
+        # Replay is recorded only once maze is loaded
+        self.record_file = None
+        self.guardian_mode = guardian_mode
+        # Levels of a level pack, None when playing a single maze
+        self.progression = None
+        # Images shared by all mazes of a level pack
+        self._assets = None
+        # Files of maze watched for hot reload
+        self.watcher = None
+
+        # If Maze object instance goes bad
+        # it is impossible to play the game
+        # so Exit with error message
+        try:
+            if (
+                data_file is not None
+                and Path(data_file).suffix == constant.PACK_SUFFIX
+            ):
+                maze = self._open_pack(data_file, prefetch)
+            else:
+                maze = Maze(data_file, guardian_mode=guardian_mode)
+        except RuntimeError:
+            print("Error during initialization of Game")
+            self.status = constant.EXIT
+            return
+        self.record_file = record_file
+        self._set_maze(maze)
+        if watch and self.progression is None:
+            self.watcher = FileWatcher(self.maze.watched_files())
+
+    def _open_pack(self, pack_file, prefetch):
+        """ Start preparation of levels of pack_file in background
+        and return maze of first level """
+        pack = LevelPack.load(pack_file)
+        if pack is None or not len(pack):
+            raise RuntimeError
+        # First level is prepared right now and its images
+        # are shared by all next levels
+        maze = Maze(level=pack[0], guardian_mode=self.guardian_mode)
+        self._assets = maze.assets
+        self.progression = Progression(pack, self._prepare_maze, 1, prefetch)
+        return maze
+
+    def _prepare_maze(self, level):
+        """ Build maze of level, called in background thread
+        while current level is played """
+        return Maze(
+            level=level, assets=self._assets, guardian_mode=self.guardian_mode
+        )
+
+    def _set_maze(self, maze):
+        """ Play maze from now, window and messages are adapted
+        to its size """
+        self.maze = maze
+        if self.record_file is not None:
+            self.maze.record()
+        if self.progression is not None:
+            pygame.display.set_caption(
+                f"Mac Gyver Escape - Level {self.progression.index + 1}"
+                + f"/{len(self.progression)}"
+            )
+
+        # Shrink window for maze smaller than default view
+        if self.maze.screen_size != (self.width, self.height):
+            self.width, self.height = self.maze.screen_size
+            self.screen = self._set_mode()
+
         # Initialize Button and Message
         self.start_button = Button(
-            (constant.MAZE_SIZE // 5, constant.MAZE_SIZE * 2 // 3),
+            (self.maze.view_w // 5, self.maze.view_h * 2 // 3),
             constant.GREEN,
             constant.BRIGHT_GREEN,
             "Start",
         )
 
         self.quit_button = Button(
-            (constant.MAZE_SIZE * 3 // 5, constant.MAZE_SIZE * 2 // 3),
+            (self.maze.view_w * 3 // 5, self.maze.view_h * 2 // 3),
             constant.RED,
             constant.BRIGHT_RED,
             "Quit",
@@ -48,73 +170,294 @@ class Game:
             constant.BLACK,
         )
 
-        self.status = constant.MENU
+        self.pause_message = Message(
+            (self.width // 2, self.height // 3),
+            "Pause",
+            constant.BIG_SIZE,
+            constant.BIG_FONT,
+            constant.WHITE,
+        )
 
-        # If Maze object instance goes bad
-        # it is impossible to play the game
-        # so Exit with error message
-        try:
-            self.maze = Maze()
-        except RuntimeError:
-            print("Error during initialization of Game")
-            self.status = constant.EXIT
-            return
+        self.instruction_message = Message(
+            (self.width // 2, self.height // 2),
+            "Move with arrows, press P to continue",
+            constant.SMALL_SIZE,
+            constant.BIG_FONT,
+            constant.WHITE,
+        )
 
-    def run(self):
-        """function used to mange the game display and behavior"""
+    def _set_mode(self):
+        """ Open window of game size, synchronized with screen
+        refresh if constant.VSYNC """
+        if constant.VSYNC:
+            return pygame.display.set_mode(
+                (self.width, self.height), pygame.SCALED, vsync=1
+            )
+        return pygame.display.set_mode((self.width, self.height))
+
+    def run(self, frames=None):
+        """function used to mange the game display and behavior,
+        leaving after frames frames if given"""
+        previous = self._time()
         while self.status:
-            # Keep loop running at the right speed
-            self.clock.tick(constant.FPS)
-            # Process input (events)
-            for event in pygame.event.get():
+            if frames is not None and self.frames >= frames:
+                break
+            # Limit frame rate if required, game logic speed
+            # do not depend on it
+            if not self.headless:
+                self.clock.tick(constant.FPS)
+            self.profiler.begin()
+            frame_status = self.status
+
+            # Process input (events), when nothing moves on screen
+            # sleep until an input or a timed transition. Captured
+            # and headless games keep a constant frame rate
+            if (
+                self.status != constant.PLAY
+                and self.status == self._displayed_status
+                and self.capture is None
+                and not self.headless
+            ):
+                events = self._wait_events()
+            else:
+                events = pygame.event.get()
+            for event in events:
                 # check exit condition
                 if event.type == pygame.QUIT:
                     self.status = constant.EXIT
+                elif event.type == pygame.KEYDOWN and event.key in (
+                    pygame.K_p,
+                    pygame.K_ESCAPE,
+                ):
+                    self._toggle_pause()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.show_profiler = not self.show_profiler
+                    self._redraw = True
+            if self.watcher is not None:
+                self._hot_reload()
+            self.profiler.lap("events")
+
+            now = self._time()
+            self._lag += now - previous
+            previous = now
+            # Apply transition scheduled for now
+            if self._transition is not None and now >= self._transition[0]:
+                self.status = self._transition[1]
+                self._transition = None
+
+            # Whole screen is redrawn when changing of status
+            # or if dirty rectangles rendering is disabled
+            if (
+                self.status != self._displayed_status
+                or not constant.DIRTY_RECTS
+            ):
+                # Game logic start again from now when entering a status
+                if self.status != self._displayed_status:
+                    self._lag = 0
+                self._displayed_status = self.status
+                self._redraw = True
 
             if self.status == constant.MENU:
                 self._menu()
 
             elif self.status == constant.PLAY:
-                self._play()
+                # Number of fixed logic steps since last frame, limited
+                # to not freeze display when too late
+                ticks = min(
+                    int(self._lag / TICK_TIME), constant.MAX_TICKS_PER_FRAME
+                )
+                self._lag = min(self._lag - ticks * TICK_TIME, TICK_TIME)
+                self._play(ticks, self._lag / TICK_TIME)
+
+            elif self.status == constant.PAUSE:
+                self._pause()
 
             elif self.status == constant.FINISH:
                 self._finish()
 
             elif self.status == constant.RESTART:
-                self.maze.restart()
-                self.status = constant.MENU
+                self._restart()
 
+            # Screen is copied without waiting for its encoding
+            if self.capture is not None:
+                self.capture.capture(self.screen)
+                self.profiler.lap("capture")
+            self.frames += 1
+
+            # Only frames of play are kept in statistics
+            self.profiler.end(frame_status == constant.PLAY)
+
+        if self.capture is not None:
+            self.capture.close()
+            print(self.capture.summary())
+        if self.trace_file is not None:
+            self.profiler.export(self.trace_file)
+        self._save_replay()
+        if self.progression is not None:
+            self.progression.close()
         pygame.quit()
 
+    def _time(self):
+        """ Return time of game in seconds, given by number of
+        frames rendered when headless """
+        if self.headless:
+            return self.frames / constant.CAPTURE_FPS
+        return time.perf_counter()
+
+    def _wait_events(self):
+        """ Block until an event happen, scheduled transition time
+        or next check of watched files and return list of events """
+        deadlines = []
+        if self._transition is not None:
+            deadlines.append(self._transition[0])
+        if self.watcher is not None:
+            deadlines.append(self.watcher.next_check)
+        if not deadlines:
+            event = pygame.event.wait()
+        else:
+            delay = min(deadlines) - time.perf_counter()
+            event = pygame.event.wait(max(1, int(delay * 1000)))
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def _hot_reload(self):
+        """ Apply modifications of maze files to current game,
+        maze is built again only if it can't be updated """
+        changed = self.watcher.changed()
+        if not changed:
+            return
+        start = time.perf_counter()
+        if not self.maze.hot_reload(changed):
+            try:
+                maze = Maze(
+                    self.maze.data_file, guardian_mode=self.guardian_mode
+                )
+            except (RuntimeError, ValueError):
+                print("Unable to reload maze")
+                return
+            self._set_maze(maze)
+            self.watcher = FileWatcher(self.maze.watched_files())
+        duration = time.perf_counter() - start
+        names = ", ".join(path.name for path in changed)
+        print(f"{names} reloaded in {duration * 1000:.1f} ms")
+        self._redraw = True
+
+    def _schedule(self, status, delay):
+        """ Change status of game after delay seconds
+        without blocking events processing """
+        self._transition = (self._time() + delay, status)
+
+    def _toggle_pause(self):
+        """ Pause game during play, or resume it if paused """
+        if self.status == constant.PLAY:
+            self.status = constant.PAUSE
+        elif self.status == constant.PAUSE:
+            self.status = constant.PLAY
+
     def _menu(self):
         """ Display for Menu status of game """
-        self.screen.fill(constant.WHITE)
+        rects = []
+        if self._redraw:
+            self.screen.fill(constant.WHITE)
+            self.menu_message.display(self.screen)
+            self.start_button.invalidate()
+            self.quit_button.invalidate()
 
-        if self.start_button.display(self.screen):
+        if self.start_button.display(self.screen, rects):
             self.status = constant.PLAY
-        if self.quit_button.display(self.screen):
+        if self.quit_button.display(self.screen, rects):
             self.status = constant.EXIT
 
-        self.menu_message.display(self.screen)
+        self.profiler.lap("messages")
 
         # Apply changes
-        pygame.display.flip()
+        self._present(rects)
 
-    def _play(self):
-        """ Display during Play status of game """
+    def _play(self, ticks=1, alpha=1.0):
+        """ Display during Play status of game.
+        Game logic advance of ticks fixed steps and display is
+        interpolated at alpha fraction of next step """
         # status keep play until maze.update
         # return constant.FINISH state
-        self.status = self.maze.update()
+        for _ in range(ticks):
+            self._update_status()
+            if self.status != constant.PLAY:
+                break
+        self.profiler.lap("update")
 
-        self.screen.fill(constant.BLACK)
+        if self._redraw:
+            self.screen.fill(constant.BLACK)
+            self.maze.invalidate()
         # Display maze and component on screen
-        self.maze.display(self.screen)
+        rects = self.maze.display(self.screen, alpha)
+        self.profiler.lap("display")
+
+        # Frame timings are displayed over information under the maze
+        if self.show_profiler:
+            rects.append(self.profiler.draw(self.screen, self.maze.hud_rect))
+        self.profiler.lap("messages")
 
         # Apply changes
-        pygame.display.flip()
+        self._present(rects)
+
+    def _update_status(self):
+        """ Advance game logic of one tick """
+        self.status = self.maze.update()
+
+    def _restart(self):
+        """ Save replay of finished game and go back to menu
+        with a new game, on next level of pack if this one is won """
+        self._save_replay()
+        self.status = constant.MENU
+        if self.progression is not None and self.maze.won:
+            try:
+                maze = self.progression.advance()
+            except RuntimeError:
+                print("Error during preparation of next level")
+                self.status = constant.EXIT
+                return
+            # Last level of pack is played again
+            if maze is not None:
+                self._set_maze(maze)
+                return
+        self.maze.restart()
+
+    def _save_replay(self):
+        """ Write replay of current game in record file, a game
+        without any tick does not replace previous one """
+        if self.record_file is None:
+            return
+        replay = self.maze.recorder
+        if not replay.ticks:
+            return
+        replay.close(self.maze.sim)
+        replay.save(self.record_file)
+
+    def _present(self, rects):
+        """ Push modified area of screen to display, or the whole screen
+        if it has been completely redrawn """
+        if self._redraw:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+        self._redraw = False
+        self.profiler.lap("flip")
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter() - self.start_time
+
+    def _pause(self):
+        """ Display instructions over maze during Pause status of game """
+        if self._redraw:
+            self.pause_message.display(self.screen)
+            self.instruction_message.display(self.screen)
+            self.profiler.lap("messages")
+            self._present([])
 
     def _finish(self):
         """ Display during Finish status of game """
+        if not self._redraw:
+            return
         self.screen.fill(constant.WHITE)
         # Create a message depending of result of game
         result = self.maze.final_result()
@@ -126,15 +469,213 @@ class Game:
             constant.BLACK,
         )
         end_message.display(self.screen)
+        self.profiler.lap("messages")
 
         # Apply changes
-        pygame.display.flip()
+        self._present([])
+
+        # Display message some time then restart to menu
+        if self._transition is None:
+            self._schedule(constant.RESTART, constant.FINISH_DELAY)
 
-        # Wait some time to display message then restart to menu
-        time.sleep(1)
-        self.status = constant.RESTART
+
+class ReplayGame(Game):
+    """ Game displaying a replay at real time instead of
+    reading keyboard """
+
+    def __init__(
+        self, replay, tick=0, capture=None, headless=False, trace_file=None
+    ):
+        super().__init__(
+            replay.level_file,
+            trace_file=trace_file,
+            guardian_mode=replay.guardian_mode,
+            capture=capture,
+            headless=headless,
+        )
+        self.replay = replay
+        self.tick = 0
+        if self.status == constant.EXIT:
+            return
+        if self.maze.grid.layout_key != replay.layout:
+            print("Replay was recorded on an other maze")
+            self.status = constant.EXIT
+            return
+        self.tick = replay.seek(self.maze.sim, tick)
+        self.maze.reload()
+        self.status = constant.PLAY
+
+    def _update_status(self):
+        """ Apply recorded action of next tick, exit once
+        actions are exhausted unless game is finishing """
+        if self.tick < self.replay.ticks:
+            action = self.replay.actions[self.tick]
+            self.tick += 1
+            self.status = self.maze.update(action)
+            return
+        self.status = self.maze.update(constant.STAY)
+        if self.status == constant.PLAY and not self.maze.player.moving:
+            self.status = constant.EXIT
+
+    def _restart(self):
+        """ Leave once the result of replay has been displayed """
+        self.status = constant.EXIT
+
+
+class AgentGame(Game):
+    """ Game played by an agent of agents module instead of
+    keyboard, to watch or render its behaviour """
+
+    def __init__(
+        self,
+        data_file,
+        agent,
+        guardian_mode=None,
+        capture=None,
+        headless=False,
+        trace_file=None,
+        record_file=None,
+        watch=False,
+    ):
+        super().__init__(
+            data_file,
+            trace_file=trace_file,
+            record_file=record_file,
+            guardian_mode=guardian_mode,
+            watch=watch,
+            capture=capture,
+            headless=headless,
+        )
+        self.agent = agent
+        if self.status != constant.EXIT:
+            self.status = constant.PLAY
+
+    def _update_status(self):
+        """ Apply action chosen by agent, once player
+        reached its previous target """
+        action = constant.STAY
+        if not self.maze.player.moving:
+            action = self.agent.act(self.maze.sim)
+        self.status = self.maze.update(action)
+
+    def _restart(self):
+        """ Leave once the result of game has been displayed """
+        self.status = constant.EXIT
 
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    parser = argparse.ArgumentParser(description="Mac Gyver Escape")
+    parser.add_argument(
+        "maze",
+        nargs="?",
+        help=f"an other maze file, or a {constant.PACK_SUFFIX} level pack",
+    )
+    parser.add_argument(
+        "--trace", help="csv or json file of frame timings written on exit"
+    )
+    parser.add_argument(
+        "--record", help="file where replay of last game is written"
+    )
+    parser.add_argument(
+        "--guardians",
+        choices=constant.GUARDIAN_MODES,
+        help="how guardians move, default " + constant.GUARDIAN_MODE,
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        help="levels of a pack prepared in advance, default "
+        + str(constant.PREFETCH_LEVELS),
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="reload maze and images when their files are modified",
+    )
+    parser.add_argument("--replay", help="watch a replay file")
+    parser.add_argument(
+        "--seek", type=int, default=0, help="tick to start replay from"
+    )
+    parser.add_argument(
+        "--agent", choices=sorted(AGENTS), help="let an agent play the maze"
+    )
+    parser.add_argument(
+        "--script", help="actions of scripted agent, ex: RRDDLU"
+    )
+    parser.add_argument(
+        "--seed", type=int, help="seed of random choices of agent"
+    )
+    parser.add_argument(
+        "--capture",
+        help="folder of PNG frames, or raw video file ending with .raw",
+    )
+    parser.add_argument(
+        "--capture-every",
+        type=int,
+        default=1,
+        help="keep only one frame out of this number",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="render replay or agent game without window,"
+        + " as fast as possible",
+    )
+    parser.add_argument(
+        "--frames", type=int, help="leave after this number of frames"
+    )
+    args = parser.parse_args()
+    if args.headless and args.replay is None and args.agent is None:
+        parser.error("--headless needs --replay or --agent")
+    # A replay is played on its own maze, and an agent leaves
+    # after one game without going to next levels
+    if args.replay is not None:
+        for option in ("record", "watch", "prefetch"):
+            if getattr(args, option):
+                parser.error(f"--{option} can't be used with --replay")
+    elif args.agent is not None and args.prefetch is not None:
+        parser.error("--prefetch can't be used with --agent")
+    capture = None
+    if args.capture is not None:
+        # numpy is only needed, and loaded, when capturing
+        from capture import FrameCapture
+
+        fps = constant.CAPTURE_FPS
+        if not args.headless and constant.FPS:
+            fps = constant.FPS
+        capture = FrameCapture(
+            args.capture, args.capture_every, fps=fps, wait=args.headless
+        )
+    if args.replay is not None:
+        replay = Replay.load(args.replay)
+        if replay is None:
+            sys.exit(1)
+        game = ReplayGame(
+            replay, args.seek, capture, args.headless, args.trace
+        )
+    elif args.agent is not None:
+        try:
+            agent = make_agent(args.agent, args.seed, args.script)
+        except ValueError as error:
+            parser.error(str(error))
+        game = AgentGame(
+            args.maze,
+            agent,
+            args.guardians,
+            capture,
+            args.headless,
+            args.trace,
+            args.record,
+            args.watch,
+        )
+    else:
+        game = Game(
+            args.maze,
+            args.trace,
+            args.record,
+            args.guardians,
+            args.prefetch,
+            args.watch,
+            capture,
+        )
+    game.run(args.frames)
@@ -1,80 +1,147 @@
 """ Contain Class Maze that manage maze and its components """
-import json
-from random import randint
+from pathlib import Path
 
 import pygame
 
 import constant
+from assets import load_assets
+from camera import Camera, ChunkCache
 from cell import Cell
 from character import Character, Player
 from display import Message
+from level import Level
+from replay import Replay
+from simulation import GUARDIAN, ITEM, Simulation
 
 
 class Maze:
     """ Class that contain maze, player, guardian and items
     and control update of game components """
 
-    def __init__(self):
+    def __init__(
+        self,
+        data_file=None,
+        seed=None,
+        guardian_mode=None,
+        level=None,
+        assets=None,
+    ):
+        """ Load maze described in data_file,
+        ressources/data.json by default, or use level if given.
+        seed is used for random placement of items and guardian_mode
+        tells how guardians move.
+        assets is a dict of images already loaded """
         # Load info from .json file
-        data = self._load_data()
+        self.data_file = data_file
+        if level is None:
+            level = Level.load(data_file)
 
-        if data is None:
+        if level is None:
             raise RuntimeError
 
         # Load image of the game
-        self.assets = self._load_assets(data["List of sprites"])
+        if assets is None:
+            assets = self._load_assets(level.sprites)
+        self.assets = assets
         if self.assets is None:
             raise RuntimeError
 
-        maze = data["Maze"]
-        # Initialize all sprite for maze background
-        self.map = {}
-        for index, val in enumerate(maze):
-            pos = (index % constant.MAZE_SIZE, index // constant.MAZE_SIZE)
-            if not val:
-                self.map[pos] = Cell(self.assets["wall"], pos)
-            else:
-                self.map[pos] = Cell(self.assets["floor"], pos)
-
-        # Initialize Guardian
-        index = maze.index("G")
-        self.guardian = Character(
-            self.assets["guardian"],
-            (index % constant.MAZE_SIZE, index // constant.MAZE_SIZE),
-        )
+        # Rules of the game are applied by the simulation,
+        # sprites only display its state. It can't be played if
+        # too few cells are reachable to place all items
+        try:
+            self.sim = Simulation(level, seed, guardian_mode=guardian_mode)
+        except ValueError as error:
+            print(error)
+            raise RuntimeError
+        # Replay recording actions of player, if enabled by record
+        self.recorder = None
+        # Grid of tile types used for all walkability checks
+        self.grid = level.grid
+
+        # Initialize Guardians
+        self.guardians = [
+            Character(self.assets["guardian"], pos) for pos in level.guardians
+        ]
+        self._guardians_left = len(self.guardians)
+        # Guardians in moving animation
+        self._animating = set()
 
         # Initialize player
-        index = maze.index("P")
-        self.player = Player(
-            self.assets["player"],
-            (index % constant.MAZE_SIZE, index // constant.MAZE_SIZE),
+        self.player = Player(self.assets["player"], level.player)
+
+        # Initialize items at position chosen by simulation, images
+        # of constant.ITEMS are used in turn.
+        # self.items only contain items still inside maze
+        self._item_sprites = [
+            Cell(self.assets[constant.ITEMS[index % len(constant.ITEMS)]], pos)
+            for index, pos in enumerate(self.sim.items)
+        ]
+        self.items = self._item_sprites[:]
+        # Sprite of each entity of simulation spatial hash
+        self._entity_sprites = {}
+        for index, sprite in enumerate(self._item_sprites):
+            self._entity_sprites[(ITEM, index)] = sprite
+        for index, sprite in enumerate(self.guardians):
+            self._entity_sprites[(GUARDIAN, index)] = sprite
+
+        # Part of maze visible on screen, in number of cells,
+        # information are displayed under it
+        self.view_w = min(constant.VIEW_W, self.grid.width)
+        self.view_h = min(constant.VIEW_H, self.grid.height)
+        self.view_rect = pygame.Rect(
+            0,
+            0,
+            self.view_w * constant.SPRITE_W,
+            self.view_h * constant.SPRITE_H,
         )
+        self.hud_rect = pygame.Rect(
+            0,
+            self.view_rect.height,
+            (self.view_w + constant.OPTIONAL_W) * constant.SPRITE_W,
+            constant.OPTIONAL_H * constant.SPRITE_H,
+        )
+        self.screen_size = self.view_rect.union(self.hud_rect).size
 
-        # Initialize items in random position
-        self.items = []
-        for i in range(3):
-            self.items.append(
-                Cell(self.assets[constant.ITEMS[i]], self._random_pos())
-            )
-
-        # Sprite group for display
-        self.all_sprites = pygame.sprite.Group()
+        self.camera = Camera(
+            self.view_rect.size,
+            (
+                self.grid.width * constant.SPRITE_W,
+                self.grid.height * constant.SPRITE_H,
+            ),
+        )
+        self.chunks = ChunkCache(
+            self.grid,
+            {
+                constant.WALL: self.assets["wall"],
+                constant.FLOOR: self.assets["floor"],
+            },
+        )
 
-        for sprite in self.map.values():
-            self.all_sprites.add(sprite)
-        for sprite in self.items:
-            self.all_sprites.add(sprite)
-        self.all_sprites.add(self.guardian)
-        self.all_sprites.add(self.player)
+        # Sprite groups for display of dynamic components only,
+        # redrawn only when they are flagged dirty.
+        # Sprites inside maze follow the camera and collected items
+        # stay on information area under the maze
+        self.all_sprites = pygame.sprite.LayeredDirty()
+        self.all_sprites.set_clip(self.view_rect)
+        self.hud_sprites = pygame.sprite.LayeredDirty()
+        self.hud_sprites.set_clip(self.hud_rect)
+
+        # Player is drawn over items and guardians, which are inside
+        # all_sprites only when seen by camera.
+        # None until visible ones are searched in simulation entities
+        self._visible = None
+        # Cells seen by camera as (left, top, right, bottom)
+        self._view_cells = (0, 0, 0, 0)
+        self.all_sprites.add(self.player, layer=1)
 
         # Create Message and Cell to display
         # if player collect enough items to fight guardian
 
         self.not_ready_message = Message(
             (
-                constant.MAZE_SIZE * constant.SPRITE_W * 3 // 4,
-                constant.MAZE_SIZE * constant.SPRITE_H
-                + constant.SPRITE_H // 2,
+                self.view_w * constant.SPRITE_W * 3 // 4,
+                self.hud_rect.centery,
             ),
             "Mac Gywer not Ready, Be Carefull",
             constant.SMALL_SIZE,
@@ -84,9 +151,8 @@ class Maze:
 
         self.ready_message = Message(
             (
-                constant.MAZE_SIZE * constant.SPRITE_W * 4 // 5,
-                constant.MAZE_SIZE * constant.SPRITE_H
-                + constant.SPRITE_H // 2,
+                self.view_w * constant.SPRITE_W * 4 // 5,
+                self.hud_rect.centery,
             ),
             "Ready to Fight",
             constant.SMALL_SIZE,
@@ -96,148 +162,410 @@ class Maze:
 
         self.arrow = Cell(
             self.assets[constant.ARROW_NAME],
-            (len(constant.ITEMS) + 1, constant.MAZE_SIZE),
+            (len(constant.ITEMS) + 1, self.view_h),
         )
         self.weapon = Cell(
             self.assets[constant.WEAPON],
-            (
-                len(constant.ITEMS) + constant.ARROW_SIZE + 1,
-                constant.MAZE_SIZE,
-            ),
+            (len(constant.ITEMS) + constant.ARROW_SIZE + 1, self.view_h),
         )
         self.weapon_sprites = pygame.sprite.Group()
         self.weapon_sprites.add(self.arrow)
         self.weapon_sprites.add(self.weapon)
 
+        # Visible part of maze and information under the maze rarely
+        # change: render them once in a background surface instead of
+        # drawing each tile every frame
+        self.background = None
+        self._hud_ready = None
+        self.build_background()
+
+    def build_background(self):
+        """ Render visible maze tiles and information under the maze
+        in the cached background surface.
+        Must be called again each time self.grid is modified """
+        self.background = pygame.Surface(self.screen_size).convert()
+        self.background.fill(constant.BLACK)
+        self.chunks.clear()
+        self.camera.follow(self._player_center())
+        self._build_view()
+        self._build_hud()
+        self.all_sprites.clear(self.background, self.background)
+        self.hud_sprites.clear(self.background, self.background)
+        self.invalidate()
+
+    def _build_view(self):
+        """ Render maze tiles seen by camera in background """
+        self.chunks.draw(self.background, self.camera.rect)
+
+    def _build_hud(self):
+        """ Render message and weapon under the maze in background
+        depending on player ready status """
+        self._hud_ready = self.sim.ready
+        self.background.fill(constant.BLACK, self.hud_rect)
+        if self._hud_ready:
+            self.ready_message.display(self.background)
+            self.weapon_sprites.draw(self.background)
+        else:
+            self.not_ready_message.display(self.background)
+
+    def invalidate(self):
+        """ Force a complete redraw of maze during next display """
+        self.all_sprites.repaint_rect(self.view_rect)
+        self.hud_sprites.repaint_rect(self.hud_rect)
+
+    def _player_center(self, alpha=1.0):
+        """ Return pixel position of player center inside maze
+        displayed at alpha fraction of next logic step """
+        pixel = self.player.interpolate(alpha)
+        return (
+            pixel[0] + constant.SPRITE_W // 2,
+            pixel[1] + constant.SPRITE_H // 2,
+        )
+
     def restart(self):
+        self.sim.reset()
+        self.reload()
+        if self.recorder is not None:
+            self.record()
+
+    def reload(self):
+        """ Place sprites according to state of simulation,
+        after it has been changed outside of update """
         returned_items = self.player.restart()
         for item in returned_items:
-            self.items.append(item)
-        for item in self.items:
-            item.pos = self._random_pos()
-        self.guardian.restart()
-
-    def _random_pos(self):
-        """ Function that return a valid random position
-        for a game items """
-        valid_pos = False
-        # TODO
-        while not valid_pos:
-            pos = (
-                randint(0, constant.MAZE_SIZE - 1),
-                randint(0, constant.MAZE_SIZE - 1),
-            )
-            if (
-                self.map[pos].image == self.assets["floor"]
-                and pos != self.guardian.pos
-                and pos != self.player.pos
-            ):
-                valid_pos = pos
-
-            # Avoid to have 2 objects at same position
-            for item in self.items:
-                if valid_pos == item.pos:
-                    valid_pos = False
-
-        return valid_pos
-
-    def _load_data(self):
-        """ Load Game information inside data.json file
-        and return it """
-        data_file = constant.RESSOURCE_FOLDER / "data.json"
-        try:
-            with open(str(data_file), "r") as json_file:
-                data = json.load(json_file)
-
-            return data
+            self.hud_sprites.remove(item)
+        self.player.moving = False
+        self.player.pos = self.sim.player
+        self.player.previous_pixel = self.player.pos_pixel
+        self.items = self._item_sprites[:]
+        for item, pos in zip(self.items, self.sim.items):
+            if pos is not None:
+                item.pos = pos
+        for guardian, pos in zip(self.guardians, self.sim.guardians):
+            guardian.restart()
+            guardian.pos = pos
+            guardian.previous_pixel = guardian.pos_pixel
+        self._animating.clear()
+        self._guardians_left = len(self.guardians)
+        # Visible sprites are searched again during next display
+        if self._visible is not None:
+            self.all_sprites.remove(*self._visible)
+            self._visible = None
+        self._sync()
+
+    def record(self):
+        """ Start recording actions of player from current state
+        of game in a new replay """
+        self.recorder = Replay.record(self.sim, self.data_file)
+
+    @property
+    def level_file(self):
+        """ Path of file the maze is loaded from """
+        if self.data_file is None:
+            return constant.RESSOURCE_FOLDER / "data.json"
+        return Path(self.data_file)
+
+    def watched_files(self):
+        """ Return paths of level file and images used by maze """
+        return [self.level_file] + [
+            constant.RESSOURCE_FOLDER / str(name + ".png")
+            for name in self.assets
+        ]
+
+    def hot_reload(self, paths):
+        """ Apply modifications of files at paths, among watched_files,
+        to the game being played: only changed tiles, items placement
+        and images are updated.
+        Return False if maze has to be built again because dimensions,
+        number of entities or images of level changed, or if
+        items can't be placed anymore, game is then left unchanged """
+        if self.level_file in paths:
+            level = Level.load(self.data_file)
+            # A level being written is applied once it can be read
+            try:
+                if level is not None and not self._change_level(level):
+                    return False
+            except ValueError as error:
+                print(error)
+                return False
+        images = [path.stem for path in paths if path != self.level_file]
+        if images:
+            self._change_images(images)
+        # Replay starts again from modified maze
+        if self.recorder is not None:
+            self.record()
+        return True
+
+    def _change_level(self, level):
+        """ Update maze to level, a new version of its level.
+        Return False if it can't be done without building it again """
+        sim = self.sim
+        if (
+            level.grid.width != self.grid.width
+            or level.grid.height != self.grid.height
+            or len(level.guardians) != len(self.guardians)
+            or level.items != sim.level.items
+            or level.sprites != sim.level.sprites
+        ):
+            return False
 
-        except (FileNotFoundError, FileExistsError) as error:
-            print(error)
-            print("Please check ressource folder before playing Game")
-            return
+        grid = self.grid
+        changed = [
+            (grid.pos(index), level.grid.tiles[index])
+            for index in grid.diff(level.grid)
+        ]
+        # Grid of maze is kept, caches and simulation refer to it
+        level.grid = grid
 
-        except KeyError as error:
-            print(
-                f"error while attempting to read {error}"
-                + "from data.jon file"
-            )
-            return
+        if (
+            level.player != sim.level.player
+            or level.guardians != sim.level.guardians
+        ):
+            # Characters start from new positions in a new game
+            sim.change_level(level, changed)
+            self.player.start = level.player
+            for guardian, pos in zip(self.guardians, level.guardians):
+                guardian.start = pos
+            self.reload()
+        else:
+            for index in sim.change_tiles(changed):
+                self._item_sprites[index].pos = sim.items[index]
+            sim.level = level
+            if self._visible is not None:
+                self._show_visible()
+
+        # Only rendered chunks of changed tiles have been dropped
+        for pos, tile in changed:
+            self.chunks.discard(pos)
+        if changed:
+            self._build_view()
+            self.invalidate()
+        if constant.CHECK_HOT_RELOAD:
+            valid, reason = sim.check_placement()
+            if not valid:
+                print(f"Hot reload failed: {reason}")
+                return False
+        return True
+
+    def _change_images(self, names):
+        """ Load images of names again. Pixels of an image of same size
+        are replaced inside assets atlas, sprites using it are
+        left untouched """
+        for name in names:
+            path = constant.RESSOURCE_FOLDER / str(name + ".png")
+            try:
+                image = pygame.image.load(str(path)).convert()
+            except (pygame.error, OSError) as error:
+                print(error)
+                continue
+            previous = self.assets[name]
+            if image.get_size() == previous.get_size():
+                previous.blit(image, (0, 0))
+                continue
+            image.set_colorkey(constant.BLACK)
+            self.assets[name] = image
+            for sprite in self._all_cells():
+                if sprite.image is previous:
+                    sprite.image = image
+                    sprite.rect.size = image.get_size()
+        self.chunks.tiles = {
+            constant.WALL: self.assets["wall"],
+            constant.FLOOR: self.assets["floor"],
+        }
+        self.build_background()
+
+    def _all_cells(self):
+        """ Iterate over all sprites of maze and information area """
+        yield self.player
+        yield from self.guardians
+        yield from self._item_sprites
+        yield self.arrow
+        yield self.weapon
+
+    def _show_visible(self):
+        """ Keep inside all_sprites only the player and the entities
+        on cells seen by camera, found with simulation spatial hash """
+        rect = self.camera.rect
+        self._view_cells = (
+            rect.left // constant.SPRITE_W,
+            rect.top // constant.SPRITE_H,
+            (rect.right - 1) // constant.SPRITE_W + 1,
+            (rect.bottom - 1) // constant.SPRITE_H + 1,
+        )
+        visible = {
+            self._entity_sprites[entity]
+            for _, entity in self.sim.entities.area(*self._view_cells)
+        }
+        # Guardians leaving the view are kept until they are out
+        visible |= self._animating
+        if self._visible is not None:
+            self.all_sprites.remove(*(self._visible - visible))
+            visible_before = self._visible
+        else:
+            visible_before = set()
+        self.all_sprites.add(*(visible - visible_before), layer=0)
+        self._visible = visible
 
     def _load_assets(self, files_names):
         """ Load Images coresponding to name inside files_names parameter
-        return a list with all this converted images """
-        folder = constant.RESSOURCE_FOLDER
-        storage = {}
+        return a dict with all this converted images """
         try:
-            for path in [folder / str(name + ".png") for name in files_names]:
-                storage[path.stem] = pygame.image.load(str(path)).convert()
-        except RuntimeError as error:
+            return load_assets(files_names)
+        except (RuntimeError, OSError) as error:
             print(error)
             return
 
-        return storage
-
-    def display(self, screen):
-        """ Display all maze sprites """
-        self.all_sprites.draw(screen)
-        if self.player.ready:
-            self.ready_message.display(screen)
-            self.weapon_sprites.draw(screen)
-        else:
-            self.not_ready_message.display(screen)
-
-    def update(self):
-        """Update the status of the maze each clock loop"""
-        if self.player.pos == self.guardian.pos:
-            if self.player.ready:
-                self.guardian.death()
-            else:
-                self.player.death()
-            # If combat between guardian and player: end of the game
-            return constant.FINISH
-
-        # player collect an item if on same position
-        for i, sprite in enumerate(self.items[:]):
-            if sprite.pos == self.player.pos:
-                self.player.add_item(self.items.pop(i))
-
-        # Check key pressed for movements
-        keystate = pygame.key.get_pressed()
-        if keystate[pygame.K_LEFT]:
-            target = self.player.pos_left
-        elif keystate[pygame.K_RIGHT]:
-            target = self.player.pos_right
-
-        elif keystate[pygame.K_UP]:
-            target = self.player.pos_up
-
-        elif keystate[pygame.K_DOWN]:
-            target = self.player.pos_down
-        else:
-            target = None
-
-        if target is not None and self._is_valid(target):
-            self.player.set_target(target)
-
+    def display(self, screen, alpha=1.0):
+        """ Display dynamic sprites over cached maze background
+        at alpha fraction of next logic step
+        and return the list of screen area modified """
+        if self.sim.ready != self._hud_ready:
+            self._build_hud()
+            self.hud_sprites.repaint_rect(self.hud_rect)
+
+        # Camera follow player, the whole view is redrawn
+        # if camera moved
+        moved = self.camera.follow(self._player_center(alpha))
+        if moved:
+            self._build_view()
+            self.all_sprites.repaint_rect(self.view_rect)
+        if moved or self._visible is None:
+            self._show_visible()
+
+        # Place sprites on screen and hide the ones out of view
+        offset = self.camera.offset
+        view_rect = self.view_rect
+        for sprite in self.all_sprites:
+            sprite.place(offset, alpha)
+            visible = view_rect.colliderect(sprite.rect)
+            if visible != sprite.visible:
+                sprite.visible = visible
+
+        return self.all_sprites.draw(screen) + self.hud_sprites.draw(screen)
+
+    def update(self, action=None):
+        """Update the status of the maze each clock loop.
+        Player is moved with arrow keys unless an action is given"""
+        # Action given to simulation during this tick
+        applied = constant.STAY
+        if not self.player.moving:
+            # Display result of last move once player reached its target
+            self._sync()
+            if self.sim.finished:
+                # If combat between guardian and player: end of the game
+                return constant.FINISH
+            if self.recorder is not None:
+                self.recorder.mark(self.sim)
+
+            if action is None:
+                action = keyboard_action()
+            if action != constant.STAY:
+                applied = action
+                self.sim.step(action)
+                if self.sim.player != self.player.pos:
+                    self.player.set_target(self.sim.player)
+                self._move_guardians()
+
+        if self.recorder is not None:
+            self.recorder.append(applied)
         self.player.update()
+        for guardian in list(self._animating):
+            guardian.update()
+            # Kept one more tick to display it at rest
+            if not guardian.moving and (
+                guardian.previous_pixel == guardian.pos_pixel
+            ):
+                self._animating.discard(guardian)
 
         return constant.PLAY
 
+    def _move_guardians(self):
+        """ Animate guardians moved by last step if seen by camera,
+        others are put directly on their new cell """
+        left, top, right, bottom = self._view_cells
+        for index in self.sim.moved:
+            guardian = self.guardians[index]
+            target = self.sim.guardians[index]
+            if guardian.moving:
+                guardian.pos = guardian.target
+                guardian.moving = False
+            if not any(
+                left <= x < right and top <= y < bottom
+                for x, y in (guardian.pos, target)
+            ):
+                guardian.pos = target
+                guardian.previous_pixel = guardian.pos_pixel
+                continue
+            if self._visible is not None and guardian not in self._visible:
+                self._visible.add(guardian)
+                self.all_sprites.add(guardian, layer=0)
+            guardian.set_target(target)
+            self._animating.add(guardian)
+
+    def _sync(self):
+        """ Apply state of simulation to sprites """
+        # player collect items picked during simulation
+        collected = len(self.player.items)
+        for index in self.sim.collected[collected:]:
+            item = self._item_sprites[index]
+            self.items.remove(item)
+            self._collect(item)
+
+        if self.sim.player_status == constant.DEAD:
+            self.player.death()
+        # Defeated guardians leave the maze
+        if self.sim.guardians_left != self._guardians_left:
+            self._guardians_left = self.sim.guardians_left
+            for guardian, status in zip(
+                self.guardians, self.sim.guardians_status
+            ):
+                if status == constant.DEAD and guardian.status:
+                    guardian.death()
+                    self._animating.discard(guardian)
+                    self._hide(guardian)
+
+    def _hide(self, sprite):
+        """ Remove sprite of an entity from maze display """
+        self.all_sprites.remove(sprite)
+        if self._visible is not None:
+            self._visible.discard(sprite)
+
+    def _collect(self, item):
+        """ Give item to player and display it under the maze
+        if there is still room for it """
+        self._hide(item)
+        slot = len(self.player.items)
+        self.player.add_item(item)
+        if slot < len(constant.ITEMS):
+            item.place((0, 0))
+            item.pos = (slot, self.view_h)
+            item.visible = 1
+            self.hud_sprites.add(item)
+
     def _is_valid(self, pos):
         """ return is pos cell can be walk in by player """
-        if (
-            pos[0] >= 0
-            and pos[1] >= 0
-            and pos[0] < constant.MAZE_SIZE
-            and pos[1] < constant.MAZE_SIZE
-            and self.map[pos].image == self.assets["floor"]
-        ):
-            return True
-        return False
+        return self.grid.is_walkable(pos)
+
+    @property
+    def won(self):
+        """ If game is finished with player alive """
+        return self.sim.status == constant.FINISH and self.sim.player_status
 
     def final_result(self):
         """ Return a string to indicate win or lose
         depending on player and guardian status """
-        if self.player.status:
-            return "You deliver Mac Gyver !!"
-        return "You lose, try again!!"
+        return self.sim.final_result()
+
+
+def keyboard_action():
+    """ Return action matching arrow key pressed, constant.STAY if none """
+    keystate = pygame.key.get_pressed()
+    if keystate[pygame.K_LEFT]:
+        return constant.LEFT
+    if keystate[pygame.K_RIGHT]:
+        return constant.RIGHT
+    if keystate[pygame.K_UP]:
+        return constant.UP
+    if keystate[pygame.K_DOWN]:
+        return constant.DOWN
+    return constant.STAY
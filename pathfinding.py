@@ -0,0 +1,381 @@
+""" Contain Pathfinder class, shortest paths inside a maze grid
+computed by breadth first search and memoized """
+import threading
+from array import array
+from collections import OrderedDict, deque
+
+import constant
+
+# Distance of cells that can't be reached
+UNREACHABLE = -1
+
+# Pathfinder shared by all grids with the same layout, levels
+# prepared in background threads use them too
+_pathfinders = OrderedDict()
+_pathfinders_lock = threading.Lock()
+
+
+def pathfinder(grid):
+    """ Return the Pathfinder of grid layout, shared with all grids
+    having same dimensions and tiles """
+    key = grid.layout_key
+    with _pathfinders_lock:
+        finder = _pathfinders.get(key)
+        # A finder answers for the grid it was built with, once this
+        # grid is changed it is replaced by a finder of a grid still
+        # matching
+        if finder is not None and finder.grid is not grid:
+            if finder.grid.layout_key != key:
+                finder = None
+        if finder is None:
+            finder = Pathfinder(grid)
+            _pathfinders[key] = finder
+            while len(_pathfinders) > constant.MAX_PATHFINDERS:
+                _pathfinders.popitem(last=False)
+        else:
+            _pathfinders.move_to_end(key)
+    return finder
+
+
+class Pathfinder:
+    """ Distance fields and shortest paths of a grid.
+    Results are memoized until the layout of the grid changes """
+
+    def __init__(self, grid, max_fields=constant.MAX_DISTANCE_FIELDS):
+        self.grid = grid
+        self.max_fields = max_fields
+        self._version = grid.version
+        # Distance field by source index, least recently used first
+        self._fields = OrderedDict()
+        # Distances between key points by tuple of points
+        self._pairs = OrderedDict()
+        # Connected components labels by tuple of blocked positions
+        self._components = {}
+
+    def clear(self):
+        """ Drop all memoized results """
+        self._fields.clear()
+        self._pairs.clear()
+        self._components.clear()
+        self._version = self.grid.version
+
+    def _check_layout(self):
+        if self.grid.version != self._version:
+            self.clear()
+
+    def distance_field(self, source):
+        """ Return array of distance from source to each cell index,
+        UNREACHABLE for walls and cells out of reach """
+        self._check_layout()
+        key = self.grid.index(source)
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+            return field
+
+        field = self._search(key)
+        self._fields[key] = field
+        while len(self._fields) > self.max_fields:
+            self._fields.popitem(last=False)
+        return field
+
+    def _search(self, start):
+        """ Breadth first search from start index on all walkable cells """
+        grid = self.grid
+        width = grid.width
+        size = width * grid.height
+        tiles = grid.tiles
+        floor = constant.FLOOR
+        field = array("l", [UNREACHABLE]) * size
+        if tiles[start] != floor:
+            return field
+
+        field[start] = 0
+        queue = deque([start])
+        pop = queue.popleft
+        push = queue.append
+        while queue:
+            index = pop()
+            distance = field[index] + 1
+            x = index % width
+            # Left, right, up and down neighbours inside grid
+            if x > 0 and field[index - 1] < 0 and tiles[index - 1] == floor:
+                field[index - 1] = distance
+                push(index - 1)
+            if (
+                x < width - 1
+                and field[index + 1] < 0
+                and tiles[index + 1] == floor
+            ):
+                field[index + 1] = distance
+                push(index + 1)
+            up = index - width
+            if up >= 0 and field[up] < 0 and tiles[up] == floor:
+                field[up] = distance
+                push(up)
+            down = index + width
+            if down < size and field[down] < 0 and tiles[down] == floor:
+                field[down] = distance
+                push(down)
+        return field
+
+    def distance(self, start, end):
+        """ Return length of shortest path between start and end,
+        None if end can't be reached """
+        distance = self.distance_field(end)[self.grid.index(start)]
+        if distance == UNREACHABLE:
+            return None
+        return distance
+
+    def reachable(self, start, end):
+        """ return if end can be reached from start """
+        return self.distance(start, end) is not None
+
+    def direction(self, start, end):
+        """ Return action to do from start to get closer to end,
+        constant.STAY if already there or end can't be reached """
+        field = self.distance_field(end)
+        grid = self.grid
+        current = field[grid.index(start)]
+        if current <= 0:
+            return constant.STAY
+        for action in constant.ACTIONS:
+            move = constant.MOVES[action]
+            cell = (start[0] + move[0], start[1] + move[1])
+            if grid.contains(cell) and field[grid.index(cell)] == current - 1:
+                return action
+        return constant.STAY
+
+    def path(self, start, end):
+        """ Return list of positions from start to end included,
+        None if end can't be reached """
+        if self.distance(start, end) is None:
+            return None
+        path = [start]
+        while path[-1] != end:
+            move = constant.MOVES[self.direction(path[-1], end)]
+            path.append((path[-1][0] + move[0], path[-1][1] + move[1]))
+        return path
+
+    def key_distances(self, points):
+        """ Return dict of shortest distance between each pair of
+        points, for example player start, guardian and items.
+        Distances are None between unreachable points """
+        self._check_layout()
+        points = tuple(points)
+        pairs = self._pairs.get(points)
+        if pairs is not None:
+            self._pairs.move_to_end(points)
+            return pairs
+
+        pairs = {}
+        for end in points:
+            for start in points:
+                pairs[(start, end)] = self.distance(start, end)
+        self._pairs[points] = pairs
+        while len(self._pairs) > self.max_fields:
+            self._pairs.popitem(last=False)
+        return pairs
+
+    def components(self, blocked=()):
+        """ Return array of connected component label of each cell index,
+        cells of same label can be reached from each other without
+        walking on blocked positions. Walls and blocked cells are
+        labelled UNREACHABLE """
+        self._check_layout()
+        blocked = tuple(blocked)
+        labels = self._components.get(blocked)
+        if labels is not None:
+            return labels
+
+        grid = self.grid
+        width = grid.width
+        size = width * grid.height
+        tiles = grid.tiles
+        floor = constant.FLOOR
+        labels = array("l", [UNREACHABLE]) * size
+        # Blocked cells are marked visited with a temporary label
+        for pos in blocked:
+            labels[grid.index(pos)] = size
+        label = 0
+        for start in range(size):
+            if tiles[start] != floor or labels[start] != UNREACHABLE:
+                continue
+            labels[start] = label
+            queue = [start]
+            while queue:
+                index = queue.pop()
+                x = index % width
+                for neighbour in (
+                    index - 1 if x > 0 else -1,
+                    index + 1 if x < width - 1 else -1,
+                    index - width,
+                    index + width,
+                ):
+                    if (
+                        0 <= neighbour < size
+                        and labels[neighbour] == UNREACHABLE
+                        and tiles[neighbour] == floor
+                    ):
+                        labels[neighbour] = label
+                        queue.append(neighbour)
+            label += 1
+        for pos in blocked:
+            labels[grid.index(pos)] = UNREACHABLE
+
+        self._components[blocked] = labels
+        return labels
+
+    def safe_cells(self, start, guardians):
+        """ Return array of index of cells reachable from start without
+        crossing any guardian, start and guardians excluded """
+        labels = self.components(guardians)
+        index = self.grid.index(start)
+        label = labels[index]
+        if label == UNREACHABLE:
+            return array("q")
+        return array(
+            "q",
+            (
+                cell
+                for cell, cell_label in enumerate(labels)
+                if cell_label == label and cell != index
+            ),
+        )
+
+    def check_layout(self, start, guardians, items):
+        """ Return tuple (solvable, reason) telling if a game with player
+        at start can collect all items without crossing any guardian,
+        then defeat all guardians. A defeated guardian opens the way
+        to the cells behind it """
+        guardians = tuple(guardians)
+        labels = self.components(guardians)
+        grid = self.grid
+        label = labels[grid.index(start)]
+        if label == UNREACHABLE:
+            return (False, f"player start {start} is not a floor cell")
+
+        for pos in items:
+            if pos in guardians or labels[grid.index(pos)] != label:
+                return (
+                    False,
+                    f"item at {pos} can't be reached without crossing"
+                    + " a guardian",
+                )
+
+        # Labels of cells around each guardian
+        around = {}
+        for guardian in guardians:
+            around[guardian] = set()
+            for move in constant.MOVES.values():
+                cell = (guardian[0] + move[0], guardian[1] + move[1])
+                if grid.contains(cell) and labels[grid.index(cell)] >= 0:
+                    around[guardian].add(labels[grid.index(cell)])
+
+        # Defeat guardians next to reached areas until none is left
+        reached = {label}
+        remaining = set(guardians)
+        progress = True
+        while remaining and progress:
+            progress = False
+            for guardian in list(remaining):
+                if around[guardian] & reached:
+                    reached |= around[guardian]
+                    remaining.discard(guardian)
+                    progress = True
+        if remaining:
+            guardian = min(remaining)
+            return (False, f"guardian at {guardian} can't be reached")
+        return (True, "all items and guardians can be reached")
+
+
+class FlowField:
+    """ Distance to a source cell of every cell at most radius steps
+    away, shared by any number of followers which read their next move
+    in constant time. Cells are stamped with the generation of the
+    search reaching them, so a new search never has to clear
+    the previous one """
+
+    def __init__(self, grid, radius=constant.CHASE_RADIUS):
+        self.grid = grid
+        self.radius = radius
+        # Arrays of distance and stamp of each cell, allocated by
+        # first search as guardians may never chase
+        self._distance = None
+        self._stamp = None
+        self._generation = 0
+        self._version = None
+        self.source = None
+
+    def update(self, source):
+        """ Search distances from source, only if source or grid
+        layout changed since last search """
+        if source == self.source and self.grid.version == self._version:
+            return
+        self.source = source
+        self._version = self.grid.version
+        self._generation += 1
+
+        grid = self.grid
+        width = grid.width
+        size = width * grid.height
+        if self._stamp is None:
+            self._distance = array("l", [0]) * size
+            self._stamp = array("l", [-1]) * size
+        tiles = grid.tiles
+        floor = constant.FLOOR
+        distances = self._distance
+        stamp = self._stamp
+        generation = self._generation
+        if not grid.contains(source) or tiles[grid.index(source)] != floor:
+            return
+        start = grid.index(source)
+
+        distances[start] = 0
+        stamp[start] = generation
+        # Cells are searched ring after ring up to radius
+        ring = [start]
+        for distance in range(1, self.radius + 1):
+            next_ring = []
+            for index in ring:
+                x = index % width
+                for neighbour in (
+                    index - 1 if x > 0 else -1,
+                    index + 1 if x < width - 1 else -1,
+                    index - width,
+                    index + width,
+                ):
+                    if (
+                        0 <= neighbour < size
+                        and stamp[neighbour] != generation
+                        and tiles[neighbour] == floor
+                    ):
+                        stamp[neighbour] = generation
+                        distances[neighbour] = distance
+                        next_ring.append(neighbour)
+            ring = next_ring
+
+    def distance(self, pos):
+        """ Return number of steps from pos to source,
+        None if pos is farther than radius or can't reach it """
+        if not self.grid.contains(pos):
+            return None
+        index = self.grid.index(pos)
+        if self._stamp is None or self._stamp[index] != self._generation:
+            return None
+        return self._distance[index]
+
+    def direction(self, pos):
+        """ Return action moving from pos one step closer to source,
+        constant.STAY if already there or out of field """
+        distance = self.distance(pos)
+        if not distance:
+            return constant.STAY
+        for action in constant.ACTIONS[1:]:
+            move = constant.MOVES[action]
+            if (
+                self.distance((pos[0] + move[0], pos[1] + move[1]))
+                == distance - 1
+            ):
+                return action
+        return constant.STAY
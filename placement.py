@@ -0,0 +1,89 @@
+""" Contain FreeCells class, index of free positions
+used to place items inside maze """
+import random
+from array import array
+
+
+class FreeCells:
+    """ Set of free positions supporting constant time random sampling,
+    occupation and release of a position.
+    Positions are stored as grid indexes in flat arrays to keep
+    memory small for large mazes """
+
+    def __init__(self, width, height, indexes=(), rng=None):
+        """ width and height are the grid dimensions, indexes an iterable
+        of free cells index, rng a random.Random instance
+        (module random by default) """
+        self._rng = rng if rng is not None else random
+        self.width = width
+        # Free indexes are stored in a list for random access and
+        # their place in this list is kept to remove them by swap
+        self._cells = array("q")
+        self._where = array("q", [-1]) * (width * height)
+        for index in indexes:
+            self._add(index)
+
+    @classmethod
+    def from_grid(cls, grid, excluded=(), rng=None):
+        """ Build index of all floor cells of grid except
+        excluded positions """
+        free = cls(grid.width, grid.height, grid.floor_indexes(), rng)
+        for pos in excluded:
+            if pos in free:
+                free.occupy(pos)
+        return free
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __contains__(self, pos):
+        return self._where[pos[1] * self.width + pos[0]] >= 0
+
+    def __iter__(self):
+        width = self.width
+        return iter([(index % width, index // width) for index in self._cells])
+
+    def _add(self, index):
+        """ Add free cell index if not already free """
+        if self._where[index] < 0:
+            self._where[index] = len(self._cells)
+            self._cells.append(index)
+
+    def sample(self):
+        """ Return a random free position without occupying it """
+        if not self._cells:
+            raise ValueError("No free cell left")
+        index = self._cells[self._rng.randrange(len(self._cells))]
+        return (index % self.width, index // self.width)
+
+    def occupy(self, pos):
+        """ Remove pos from free positions """
+        index = pos[1] * self.width + pos[0]
+        place = self._where[index]
+        if place < 0:
+            raise KeyError(pos)
+        self._where[index] = -1
+        last = self._cells.pop()
+        # Move last index in the hole left by pos
+        if place < len(self._cells):
+            self._cells[place] = last
+            self._where[last] = place
+
+    def release(self, pos):
+        """ Add pos to free positions, do nothing if already free """
+        self._add(pos[1] * self.width + pos[0])
+
+    def take(self):
+        """ Return a random free position and occupy it """
+        pos = self.sample()
+        self.occupy(pos)
+        return pos
+
+    def take_many(self, number):
+        """ Return number distinct random free positions
+        and occupy all of them """
+        if number > len(self._cells):
+            raise ValueError(
+                f"Only {len(self._cells)} free cells for {number} items"
+            )
+        return [self.take() for _ in range(number)]
@@ -0,0 +1,131 @@
+""" Contain FrameProfiler class, timing of each stage of a frame
+kept in ring buffers, displayed on screen or exported to a file """
+import csv
+import json
+import time
+from array import array
+from pathlib import Path
+
+import constant
+from display import text_cache
+
+# Stages of a frame, in order
+STAGES = ("events", "update", "display", "messages", "flip", "capture")
+
+
+class RingBuffer:
+    """ Last size float values, older values are overwritten """
+
+    def __init__(self, size):
+        self._values = array("d", [0.0]) * size
+        self._next = 0
+        self.count = 0
+
+    def append(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self.count = min(self.count + 1, len(self._values))
+
+    def values(self):
+        """ Return list of values from oldest to newest """
+        values = self._values.tolist()
+        count = self.count
+        first = self._next
+        if count < len(values):
+            return values[:count]
+        return values[first:] + values[:first]
+
+    def percentile(self, percent):
+        """ Return value below which percent of values are,
+        0 if empty """
+        count = self.count
+        values = sorted(self._values[:count])
+        if not values:
+            return 0.0
+        rank = min(len(values) - 1, int(len(values) * percent / 100))
+        return values[rank]
+
+
+class FrameProfiler:
+    """ Measure time spent in each stage of the last frames """
+
+    def __init__(self, size=constant.PROFILE_FRAMES):
+        self.buffers = {stage: RingBuffer(size) for stage in STAGES}
+        self.total = RingBuffer(size)
+        self._frame = {}
+        self._start = self._last = time.perf_counter()
+        # Overlay text is refreshed every PROFILE_REFRESH frames
+        self._overlay = None
+        self._frames = 0
+
+    def begin(self):
+        """ Start timing of a new frame """
+        self._frame = {}
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """ Record time since previous lap as duration of stage """
+        now = time.perf_counter()
+        self._frame[stage] = self._frame.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def end(self, keep=True):
+        """ End timing of frame, kept in statistics if keep """
+        if not keep:
+            return
+        for stage in STAGES:
+            self.buffers[stage].append(self._frame.get(stage, 0.0))
+        self.total.append(self._last - self._start)
+        self._frames += 1
+
+    def summary(self):
+        """ Return dict of p50, p95 and p99 in milliseconds by stage """
+        buffers = dict(self.buffers, total=self.total)
+        return {
+            stage: {
+                f"p{percent}": buffer.percentile(percent) * 1000
+                for percent in (50, 95, 99)
+            }
+            for stage, buffer in buffers.items()
+        }
+
+    def draw(self, screen, rect):
+        """ Draw p95 of each stage inside rect of screen
+        and return the modified rect """
+        if self._overlay is None or self._frames >= constant.PROFILE_REFRESH:
+            self._frames = 0
+            summary = self.summary()
+            text = "  ".join(
+                f"{stage[:4]} {summary[stage]['p95']:.1f}"
+                for stage in STAGES + ("total",)
+            )
+            font = text_cache.font(constant.BIG_FONT, constant.PROFILE_SIZE)
+            self._overlay = font.render("p95 ms " + text, True, constant.WHITE)
+        screen.fill(constant.BLACK, rect)
+        screen.blit(
+            self._overlay, self._overlay.get_rect(midleft=rect.midleft)
+        )
+        return rect
+
+    def export(self, trace_file):
+        """ Write duration in milliseconds of each stage of all recorded
+        frames in trace_file, in csv format or in json format with the
+        summary if file suffix is .json """
+        buffers = dict(self.buffers, total=self.total)
+        columns = {
+            stage: [value * 1000 for value in buffer.values()]
+            for stage, buffer in buffers.items()
+        }
+        frames = [
+            dict(zip(columns, values)) for values in zip(*columns.values())
+        ]
+        trace_file = Path(trace_file)
+        with open(str(trace_file), "w", newline="") as output:
+            if trace_file.suffix == ".json":
+                json.dump(
+                    {"summary": self.summary(), "frames": frames}, output
+                )
+            else:
+                writer = csv.DictWriter(output, fieldnames=list(columns))
+                writer.writeheader()
+                writer.writerows(frames)
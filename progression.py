@@ -0,0 +1,73 @@
+""" Contain Progression class, levels of a pack played one after
+the other and prepared in background """
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import constant
+
+
+class Progression:
+    """ Levels of a LevelPack played in order. Next levels are prepared
+    by a background thread while the current one is played, so that
+    changing of level only swap prepared objects """
+
+    def __init__(self, pack, prepare, start=0, prefetch=None):
+        """ prepare is called in background thread with each Level and
+        return the object used to play it, for example a Maze.
+        At most prefetch levels, constant.PREFETCH_LEVELS by default,
+        are prepared in advance """
+        self.pack = pack
+        self.prefetch = max(
+            1, constant.PREFETCH_LEVELS if prefetch is None else prefetch
+        )
+        # Index in pack of current level, played before start
+        self.index = start - 1
+        self._prepare = prepare
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="prefetch"
+        )
+        # Futures of prepared levels, in order, and index of next
+        # level to prepare
+        self._pending = deque()
+        self._next = start
+        self._fill()
+
+    def __len__(self):
+        return len(self.pack)
+
+    def _fill(self):
+        """ Start preparation of next levels until prefetch
+        levels are pending """
+        while len(self._pending) < self.prefetch and self._next < len(
+            self.pack
+        ):
+            self._pending.append(
+                self._executor.submit(self._load, self._next)
+            )
+            self._next += 1
+
+    def _load(self, index):
+        """ Read level at index and prepare it, in background thread """
+        return self._prepare(self.pack[index])
+
+    @property
+    def ready(self):
+        """ If next level is prepared, advance would not block """
+        return bool(self._pending) and self._pending[0].done()
+
+    def advance(self):
+        """ Return prepared next level, waiting for it if still in
+        preparation, None after last level.
+        Exceptions raised by prepare are raised again here """
+        if not self._pending:
+            return
+        future = self._pending.popleft()
+        self.index = self._next - len(self._pending) - 1
+        self._fill()
+        return future.result()
+
+    def close(self):
+        """ Stop preparation of levels not started yet """
+        for future in self._pending:
+            future.cancel()
+        self._executor.shutdown(wait=False)
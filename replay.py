@@ -0,0 +1,212 @@
+""" Contain Replay class, record of the actions of player during
+one game, to watch it again or verify it at maximum speed
+without display:
+
+    python main.py --record game.rpl
+    python main.py --replay game.rpl --seek 600
+    python replay.py game.rpl --repeat 1000
+"""
+import argparse
+import bisect
+import json
+import sys
+import time
+import zlib
+
+import constant
+from level import Level
+from simulation import Simulation
+
+# Version of replay file format
+VERSION = 3
+
+
+class Replay:
+    """ Action applied at each logic tick of a game, with state of game
+    at start, at regular checkpoints and at end """
+
+    def __init__(
+        self,
+        level_file=None,
+        layout=None,
+        seed=None,
+        start=None,
+        guardian_mode=constant.GUARDIAN_MODE,
+    ):
+        """ level_file is the maze played (default one if None),
+        layout the key of its grid, start the state of game
+        when recording began """
+        self.level_file = level_file
+        self.layout = layout
+        self.seed = seed
+        self.start = start
+        self.guardian_mode = guardian_mode
+        # One byte per tick, constant.STAY when no move was done
+        self.actions = bytearray()
+        # List of (tick, state) sorted by tick, state being the game
+        # state before the action of this tick
+        self.checkpoints = [(0, start)]
+        self.end = None
+
+    @classmethod
+    def record(cls, sim, level_file=None):
+        """ Start a replay of game of sim from its current state """
+        return cls(
+            str(level_file) if level_file is not None else None,
+            sim.grid.layout_key,
+            sim.seed,
+            sim.snapshot(),
+            sim.guardian_mode,
+        )
+
+    @property
+    def ticks(self):
+        return len(self.actions)
+
+    def mark(self, sim):
+        """ Save state of sim as checkpoint of next tick if last
+        checkpoint is old enough """
+        if self.ticks - self.checkpoints[-1][0] >= constant.REPLAY_CHECKPOINT:
+            self.checkpoints.append((self.ticks, sim.snapshot()))
+
+    def append(self, action):
+        """ Add action applied during next tick """
+        self.actions.append(action)
+
+    def close(self, sim):
+        """ Save state of sim at end of recording """
+        self.end = sim.snapshot()
+
+    def save(self, replay_file):
+        """ Write replay as a json header line followed by
+        compressed actions """
+        header = {
+            "version": VERSION,
+            "level": self.level_file,
+            "layout": self.layout,
+            "seed": self.seed,
+            "guardian_mode": self.guardian_mode,
+            "ticks": self.ticks,
+            "checkpoints": self.checkpoints,
+            "end": self.end,
+        }
+        with open(replay_file, "wb") as output:
+            output.write(json.dumps(header).encode() + b"\n")
+            output.write(zlib.compress(bytes(self.actions)))
+
+    @classmethod
+    def load(cls, replay_file):
+        """ Read replay written by save,
+        return None if file can not be read """
+        try:
+            with open(replay_file, "rb") as replay:
+                header = json.loads(replay.readline())
+                actions = zlib.decompress(replay.read())
+        except (OSError, ValueError, zlib.error) as error:
+            print(f"Can not read replay {replay_file}: {error}")
+            return
+        if header.get("version") != VERSION:
+            print(f"Unsupported replay version {header.get('version')}")
+            return
+
+        checkpoints = [tuple(point) for point in header["checkpoints"]]
+        replay = cls(
+            header["level"],
+            header["layout"],
+            header["seed"],
+            checkpoints[0][1],
+            header["guardian_mode"],
+        )
+        replay.checkpoints = checkpoints
+        replay.actions = bytearray(actions)
+        replay.end = header["end"]
+        return replay
+
+    def simulation(self, level=None):
+        """ Return a Simulation at start of replay, on level
+        or the recorded level file if not given """
+        if level is None:
+            level = Level.load(self.level_file)
+            if level is None:
+                return
+        if level.grid.layout_key != self.layout:
+            raise ValueError("replay was recorded on an other maze")
+        sim = Simulation(level, self.seed, guardian_mode=self.guardian_mode)
+        sim.restore(self.start)
+        return sim
+
+    def fast_forward(self, sim, start, stop):
+        """ Apply actions of ticks start to stop to sim,
+        no tick is needed when player does not move """
+        actions = bytes(self.actions[start:stop])
+        for action in actions.translate(None, bytes([constant.STAY])):
+            if sim.step(action) != constant.PLAY:
+                break
+
+    def seek(self, sim, tick):
+        """ Put sim in state before action of tick, from the closest
+        checkpoint. Return tick reached """
+        tick = max(0, min(tick, self.ticks))
+        ticks = [point[0] for point in self.checkpoints]
+        checkpoint, state = self.checkpoints[bisect.bisect(ticks, tick) - 1]
+        sim.restore(state)
+        self.fast_forward(sim, checkpoint, tick)
+        return tick
+
+    def verify(self, sim):
+        """ Play whole replay on sim from its start and check state
+        at each checkpoint and at end.
+        Return tick of first difference, None if all states match """
+        sim.restore(self.start)
+        tick = 0
+        for checkpoint, state in self.checkpoints[1:]:
+            self.fast_forward(sim, tick, checkpoint)
+            tick = checkpoint
+            if sim.snapshot() != state:
+                return tick
+        self.fast_forward(sim, tick, self.ticks)
+        if self.end is not None and sim.snapshot() != self.end:
+            return self.ticks
+
+
+def verify(replay, repeat=1):
+    """ Check replay at maximum speed repeat times without display,
+    return True if game went through all recorded states """
+    try:
+        sim = replay.simulation()
+    except ValueError as error:
+        print(error)
+        return False
+    if sim is None:
+        return False
+    start = time.perf_counter()
+    for _ in range(repeat):
+        tick = replay.verify(sim)
+        if tick is not None:
+            print(f"Replay differ from recorded game at tick {tick}")
+            return False
+    duration = time.perf_counter() - start
+    speed = replay.ticks * repeat / duration / constant.TICK_RATE
+    print(
+        f"{repeat} replays of {replay.ticks} ticks verified in "
+        f"{duration:.3f} s, {speed:.0f} times faster than real time"
+    )
+    # A game can be recorded before its end
+    if sim.finished:
+        print(sim.final_result())
+    else:
+        print(f"Game still in progress after {sim.steps} steps")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Verify a recorded game at maximum speed"
+    )
+    parser.add_argument("replay", help="replay file written by main.py")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    replay = Replay.load(args.replay)
+    if replay is None or not verify(replay, args.repeat):
+        sys.exit(1)
@@ -0,0 +1,314 @@
+""" Host many headless games in one process behind a local socket,
+for bots and test harnesses, for example:
+
+    python server.py --unix /tmp/maze.sock
+    python server.py ressources/data.mgl --port 8765 --guardians chase
+
+Requests and responses are lines of space separated fields. Responses
+come in the order of requests, so requests can be sent without waiting
+for previous responses:
+
+    N [seed]        new game        N id state
+    S id actions    step game       S id state
+    R id [seed]     restart game    R id state
+    F id            final result    F id text
+    M id            metrics         M id requests ticks mean p50 p99 max
+    C id            close game      C id
+
+actions is a string of digits, the value of one of constant.ACTIONS
+for each tick, so one request advance a game of many ticks. state is
+"status steps x y collected guardians_left" and metrics give the time
+spent by server on requests of the game, in microseconds.
+Invalid requests are answered by "E message".
+Games created by a connection are closed with it.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from collections import deque
+
+import constant
+from level import Level
+from simulation import Simulation
+
+# Commands of requests, first field of request and response lines
+NEW = "N"
+STEP = "S"
+RESET = "R"
+RESULT = "F"
+METRICS = "M"
+CLOSE = "C"
+ERROR = "E"
+
+# Digits of actions inside step requests and table translating them
+# to action values. Only invalid characters are left once DIGITS
+# are deleted from a request
+DIGITS = "".join(str(action) for action in constant.ACTIONS).encode()
+ACTION_BYTES = bytes.maketrans(DIGITS, bytes(constant.ACTIONS))
+
+# Longest request line accepted, a step request of
+# constant.SERVER_MAX_BATCH ticks with room for its other fields
+LINE_LIMIT = constant.SERVER_MAX_BATCH + 64
+# Requests of a connection answered before letting other
+# connections run, when a client sends many requests at once
+FAIR_REQUESTS = 32
+
+
+def percentile(values, fraction):
+    """ Return value under which fraction of sorted values are """
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Session:
+    """ A game hosted by server, with time spent on its requests """
+
+    def __init__(self, session_id, sim):
+        self.id = session_id
+        self.sim = sim
+        self.requests = 0
+        self.ticks = 0
+        # Time spent on requests in nanoseconds, in total and for
+        # last constant.LATENCY_WINDOW requests
+        self.total_latency = 0
+        self.max_latency = 0
+        self.latencies = deque(maxlen=constant.LATENCY_WINDOW)
+
+    def state(self):
+        """ Return state fields of game as a string """
+        sim = self.sim
+        return (
+            f"{sim.status} {sim.steps} {sim.player[0]} {sim.player[1]}"
+            + f" {len(sim.collected)} {sim.guardians_left}"
+        )
+
+    def step(self, actions):
+        """ Play actions, a bytes of action values, until end of game """
+        steps = self.sim.steps
+        self.sim.run(actions)
+        self.ticks += self.sim.steps - steps
+
+    def measure(self, latency):
+        """ Account a request that took latency nanoseconds """
+        self.requests += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.latencies.append(latency)
+
+    def metrics(self):
+        """ Return metrics fields as a string, latencies
+        in microseconds """
+        latencies = sorted(self.latencies)
+        mean = self.total_latency / max(1, self.requests)
+        return (
+            f"{self.requests} {self.ticks} {mean / 1000:.1f}"
+            + f" {percentile(latencies, 0.5) / 1000:.1f}"
+            + f" {percentile(latencies, 0.99) / 1000:.1f}"
+            + f" {self.max_latency / 1000:.1f}"
+        )
+
+
+class SessionServer:
+    """ Games on a same level, played by requests of clients """
+
+    def __init__(self, level, guardian_mode=None, max_sessions=None):
+        """ level is a Level instance shared by all games,
+        at most max_sessions games, constant.SERVER_MAX_SESSIONS
+        by default, are hosted at once """
+        self.level = level
+        self.guardian_mode = guardian_mode
+        if max_sessions is None:
+            max_sessions = constant.SERVER_MAX_SESSIONS
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.requests = 0
+        self._next_id = 0
+        # Answer of each command for an existing session
+        self._commands = {
+            STEP: self._step,
+            RESET: self._reset,
+            RESULT: self._result,
+            METRICS: self._metrics,
+            CLOSE: self._close,
+        }
+
+    def request(self, line, owned=None):
+        """ Return response line to request line, without newlines.
+        Ids of games created or closed are added to or removed
+        from owned set if given """
+        start = time.perf_counter_ns()
+        fields = line.split()
+        try:
+            if not fields:
+                raise ValueError("empty request")
+            if fields[0] == NEW:
+                session = self._new(fields[1:], owned)
+                response = f"{NEW} {session.id} {session.state()}"
+            elif fields[0] in self._commands:
+                session = self._session(fields[1:])
+                response = self._commands[fields[0]](
+                    session, fields[2:], owned
+                )
+            else:
+                raise ValueError(f"unknown command {fields[0]}")
+        except ValueError as error:
+            return f"{ERROR} {error}"
+        self.requests += 1
+        session.measure(time.perf_counter_ns() - start)
+        return response
+
+    def _session(self, fields):
+        """ Return session of id in first field """
+        if not fields:
+            raise ValueError("missing game id")
+        try:
+            return self.sessions[int(fields[0])]
+        except (KeyError, ValueError):
+            raise ValueError(f"unknown game {fields[0]}")
+
+    def _seed(self, fields):
+        """ Return seed in first field, None if there is none """
+        if not fields:
+            return
+        try:
+            return int(fields[0])
+        except ValueError:
+            raise ValueError(f"invalid seed {fields[0]}")
+
+    def _new(self, fields, owned):
+        if len(self.sessions) >= self.max_sessions:
+            raise ValueError(f"limit of {self.max_sessions} games reached")
+        sim = Simulation(
+            self.level, self._seed(fields), guardian_mode=self.guardian_mode
+        )
+        session = Session(self._next_id, sim)
+        self._next_id += 1
+        self.sessions[session.id] = session
+        if owned is not None:
+            owned.add(session.id)
+        return session
+
+    def _step(self, session, fields, owned):
+        if len(fields) != 1:
+            raise ValueError("expected one string of actions")
+        actions = fields[0].encode()
+        if len(actions) > constant.SERVER_MAX_BATCH:
+            raise ValueError(
+                f"more than {constant.SERVER_MAX_BATCH} actions"
+            )
+        if actions.translate(None, DIGITS):
+            raise ValueError(f"invalid actions {fields[0]}")
+        session.step(actions.translate(ACTION_BYTES))
+        return f"{STEP} {session.id} {session.state()}"
+
+    def _reset(self, session, fields, owned):
+        session.sim.reset(self._seed(fields))
+        return f"{RESET} {session.id} {session.state()}"
+
+    def _result(self, session, fields, owned):
+        if not session.sim.finished:
+            raise ValueError(f"game {session.id} is not finished")
+        return f"{RESULT} {session.id} {session.sim.final_result()}"
+
+    def _metrics(self, session, fields, owned):
+        return f"{METRICS} {session.id} {session.metrics()}"
+
+    def _close(self, session, fields, owned):
+        del self.sessions[session.id]
+        if owned is not None:
+            owned.discard(session.id)
+        return f"{CLOSE} {session.id}"
+
+    async def serve_client(self, reader, writer):
+        """ Answer requests of a connection until it is closed """
+        owned = set()
+        answered = 0
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(f"{ERROR} request too long\n".encode())
+                    break
+                if not line:
+                    break
+                response = self.request(line.decode("ascii", "replace"), owned)
+                writer.write(response.encode() + b"\n")
+                # Requests are not read anymore while client does not
+                # read responses, its socket fills and it has to wait
+                await writer.drain()
+                # Requests already received are answered without
+                # waiting, other connections run from time to time
+                answered += 1
+                if answered % FAIR_REQUESTS == 0:
+                    await asyncio.sleep(0)
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    async def start(self, port=None, path=None):
+        """ Listen on unix socket path if given, else on loopback
+        port, constant.SERVER_PORT by default, 0 for any free port.
+        Return the asyncio Server """
+        if path is not None:
+            return await asyncio.start_unix_server(
+                self.serve_client, path, limit=LINE_LIMIT
+            )
+        if port is None:
+            port = constant.SERVER_PORT
+        return await asyncio.start_server(
+            self.serve_client, constant.SERVER_HOST, port, limit=LINE_LIMIT
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Host headless games")
+    parser.add_argument("maze", nargs="?", help="an other maze file")
+    parser.add_argument(
+        "--port",
+        type=int,
+        help=f"loopback port, default {constant.SERVER_PORT}",
+    )
+    parser.add_argument("--unix", help="unix socket path instead of port")
+    parser.add_argument(
+        "--guardians",
+        choices=constant.GUARDIAN_MODES,
+        help="how guardians move, default " + constant.GUARDIAN_MODE,
+    )
+    parser.add_argument(
+        "--max-sessions",
+        type=int,
+        help=f"default {constant.SERVER_MAX_SESSIONS}",
+    )
+    return parser.parse_args(argv)
+
+
+async def main(args):
+    """ Serve games until interrupted, return False if level
+    can't be loaded """
+    level = Level.load(args.maze)
+    if level is None:
+        return False
+    server = SessionServer(level, args.guardians, args.max_sessions)
+    try:
+        listener = await server.start(args.port, args.unix)
+    except OSError as error:
+        print(error)
+        return False
+    for socket in listener.sockets:
+        print(f"Serving games on {socket.getsockname()}")
+    async with listener:
+        await listener.serve_forever()
+    return True
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(0 if asyncio.run(main(parse_args())) else 1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,175 @@
+""" Run many headless games across all cores and report statistics
+on their outcome, for example:
+
+    python simulate.py --games 100000 --agent greedy --output games.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import constant
+from agents import AGENTS, make_agent
+from level import Level
+from simulation import Simulation
+
+# Result of games stopped before their end
+TIMEOUT = "timeout"
+
+# Level and settings shared by all games of a worker process
+_worker = {}
+
+
+def load_settings(data_file, agent, script, max_steps, guardian_mode=None):
+    """ Return dict of simulation of level, agent and settings of games.
+    Raise RuntimeError if level can't be loaded and ValueError
+    if agent or items placement are not valid """
+    level = Level.load(data_file)
+    if level is None:
+        raise RuntimeError(f"Unable to load level {data_file}")
+    return {
+        "sim": Simulation(level, guardian_mode=guardian_mode),
+        "agent": make_agent(agent, script=script),
+        "max_steps": max_steps,
+    }
+
+
+def _init_worker(*settings):
+    """ Load level once per worker process. A pool starts again
+    forever workers failing to start, so an error is only
+    kept and raised by games of the worker """
+    try:
+        _worker.update(load_settings(*settings))
+    except (RuntimeError, ValueError) as error:
+        _worker["error"] = error
+
+
+def play(sim, agent, seed, max_steps):
+    """ Play one game from seed and return its result as a dict """
+    sim.reset(seed)
+    agent.reset(seed)
+    while sim.status == constant.PLAY and sim.steps < max_steps:
+        sim.step(agent.act(sim))
+    return {
+        "seed": seed,
+        "result": sim.final_result() if sim.finished else TIMEOUT,
+        "steps": sim.steps,
+        "items": len(sim.collected),
+    }
+
+
+def _play_chunk(seeds):
+    """ Play all games of a range of seeds inside a worker """
+    if "error" in _worker:
+        raise _worker["error"]
+    sim = _worker["sim"]
+    agent = _worker["agent"]
+    max_steps = _worker["max_steps"]
+    return [play(sim, agent, seed, max_steps) for seed in seeds]
+
+
+class Statistics:
+    """ Aggregate results of games without keeping them """
+
+    def __init__(self):
+        self.games = 0
+        self.results = Counter()
+        self.items = Counter()
+        self.finished_steps = 0
+        self.finished = 0
+        self.max_steps = 0
+
+    def add(self, game):
+        self.games += 1
+        self.results[game["result"]] += 1
+        if game["result"] != TIMEOUT:
+            # Items collected before guardian encounter, timed out
+            # games never met the guardian
+            self.items[game["items"]] += 1
+            self.finished += 1
+            self.finished_steps += game["steps"]
+            self.max_steps = max(self.max_steps, game["steps"])
+
+    def summary(self):
+        """ Return statistics as a dict ready for json """
+        return {
+            "games": self.games,
+            "results": {
+                result: {"count": count, "rate": count / self.games}
+                for result, count in self.results.items()
+            },
+            "mean_steps_to_finish": (
+                self.finished_steps / self.finished if self.finished else None
+            ),
+            "max_steps_to_finish": self.max_steps,
+            "items_before_encounter": dict(sorted(self.items.items())),
+        }
+
+
+def run(args):
+    """ Play all games in a process pool, stream each result in output
+    file and return aggregated statistics.
+    Raise RuntimeError or ValueError like load_settings """
+    settings = (
+        args.level,
+        args.agent,
+        args.script,
+        args.max_steps,
+        args.guardians,
+    )
+    # Level and agent are checked once before starting workers
+    load_settings(*settings)
+    end = args.seed + args.games
+    chunks = [
+        range(start, min(start + args.chunk_size, end))
+        for start in range(args.seed, end, args.chunk_size)
+    ]
+    stats = Statistics()
+    output = open(args.output, "w") if args.output else None
+    try:
+        with Pool(args.workers, _init_worker, settings) as pool:
+            for results in pool.imap_unordered(_play_chunk, chunks):
+                for game in results:
+                    stats.add(game)
+                    if output is not None:
+                        output.write(json.dumps(game) + "\n")
+    finally:
+        if output is not None:
+            output.close()
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--agent", choices=sorted(AGENTS), default="random")
+    parser.add_argument(
+        "--script", help="actions of scripted agent, ex: RRDDLU"
+    )
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--level", help="data file of the maze")
+    parser.add_argument(
+        "--guardians",
+        choices=constant.GUARDIAN_MODES,
+        help="how guardians move, default " + constant.GUARDIAN_MODE,
+    )
+    parser.add_argument("--output", help="json lines file of all games")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start = time.perf_counter()
+    try:
+        stats = run(args)
+    except (RuntimeError, ValueError) as error:
+        sys.exit(f"Unable to simulate games: {error}")
+    summary = stats.summary()
+    summary["seconds"] = time.perf_counter() - start
+    print(json.dumps(summary, indent=4))
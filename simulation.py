@@ -0,0 +1,561 @@
+""" Contain Simulation class, rules of the game without any
+display or input, to be run headless and deterministically """
+import random
+from collections import deque
+
+import constant
+from pathfinding import FlowField, pathfinder
+from placement import FreeCells
+from spatial import SpatialHash
+
+# Kinds of entities inside spatial hash
+ITEM = 0
+GUARDIAN = 1
+
+# Cells searched around a changed tile to find cells joined to or cut
+# from player area, above them items placement is built again
+LOCAL_SEARCH = 4096
+
+# Actions tried in turn by a patrolling guardian for each direction
+# it is heading to: straight, right, left then back
+PATROL_TURNS = {
+    constant.LEFT: (constant.LEFT, constant.UP, constant.DOWN, constant.RIGHT),
+    constant.UP: (constant.UP, constant.RIGHT, constant.LEFT, constant.DOWN),
+    constant.RIGHT: (
+        constant.RIGHT,
+        constant.DOWN,
+        constant.UP,
+        constant.LEFT,
+    ),
+    constant.DOWN: (constant.DOWN, constant.LEFT, constant.RIGHT, constant.UP),
+}
+
+
+class Simulation:
+    """ State of one game on a level, advanced one move at a time
+    by explicit actions. All randomness comes from the seed """
+
+    def __init__(self, level, seed=None, items=None, guardian_mode=None):
+        """ level is a Level instance, items the number of items
+        to place inside maze, level.items by default, guardian_mode
+        one of constant.GUARDIAN_MODES, constant.GUARDIAN_MODE
+        by default """
+        self.level = level
+        self.grid = level.grid
+        self.seed = seed
+        if guardian_mode is None:
+            guardian_mode = constant.GUARDIAN_MODE
+        if guardian_mode not in constant.GUARDIAN_MODES:
+            raise ValueError(f"unknown guardian mode {guardian_mode}")
+        self.guardian_mode = guardian_mode
+        # Distances to player shared by all chasing guardians
+        self.flow = FlowField(self.grid)
+        self.rng = random.Random(seed)
+        self.items_needed = level.items if items is None else items
+        # Index of cells free for items placement, only cells reachable
+        # from player start without crossing guardians are used
+        self.free_cells = FreeCells(
+            self.grid.width,
+            self.grid.height,
+            pathfinder(self.grid).safe_cells(level.player, level.guardians),
+            self.rng,
+        )
+        # Items and guardians indexed by cell, so a step only look at
+        # player cell whatever the number of entities
+        self.entities = SpatialHash()
+        # Position of each item, None once collected
+        self.items = self._random_positions(self.items_needed)
+        self._start()
+
+    def _start(self):
+        """ Put characters at their starting state """
+        self.player = self.level.player
+        self.guardians = list(self.level.guardians)
+        self.player_status = constant.ALIVE
+        self.guardians_status = [constant.ALIVE] * len(self.guardians)
+        self.guardians_left = len(self.guardians)
+        # Direction of patrolling guardians and index of guardians
+        # moved during last step
+        self.guardians_direction = [constant.LEFT] * len(self.guardians)
+        self.moved = []
+        # Index of collected items in order of collection
+        self.collected = []
+        self.status = constant.PLAY
+        self.steps = 0
+        self._index_entities()
+
+    def _index_entities(self):
+        """ Fill spatial hash with items and guardians still in game """
+        self.entities.clear()
+        for index, pos in enumerate(self.items):
+            if pos is not None:
+                self.entities.add(pos, (ITEM, index))
+        for index, pos in enumerate(self.guardians):
+            if self.guardians_status[index] == constant.ALIVE:
+                self.entities.add(pos, (GUARDIAN, index))
+
+    def reset(self, seed=None):
+        """ Start a new game on same level, items are placed again.
+        Random generator is seeded again if seed is given """
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+        for pos in self.items:
+            if pos is not None:
+                self.free_cells.release(pos)
+        self.items = self._random_positions(self.items_needed)
+        self._start()
+
+    def snapshot(self):
+        """ Return state of the game as a dict of plain values,
+        that can be stored as json and given back to restore """
+        return {
+            "player": list(self.player),
+            "guardians": [list(pos) for pos in self.guardians],
+            "player_status": self.player_status,
+            "guardians_status": list(self.guardians_status),
+            "guardians_direction": list(self.guardians_direction),
+            "items": [list(pos) if pos else None for pos in self.items],
+            "collected": list(self.collected),
+            "status": self.status,
+            "steps": self.steps,
+        }
+
+    def restore(self, state):
+        """ Put game back in a state returned by snapshot """
+        for pos in self.items:
+            if pos is not None:
+                self.free_cells.release(pos)
+        self.items = [tuple(pos) if pos else None for pos in state["items"]]
+        for pos in self.items:
+            if pos is not None:
+                self.free_cells.occupy(pos)
+        self.player = tuple(state["player"])
+        self.guardians = [tuple(pos) for pos in state["guardians"]]
+        self.player_status = state["player_status"]
+        self.guardians_status = list(state["guardians_status"])
+        self.guardians_left = self.guardians_status.count(constant.ALIVE)
+        self.guardians_direction = list(state["guardians_direction"])
+        self.moved = []
+        self.collected = list(state["collected"])
+        self.status = state["status"]
+        self.steps = state["steps"]
+        self._index_entities()
+
+    def change_level(self, level, tiles=()):
+        """ Start a new game on level, a new version of current level
+        on the same grid whose tiles, an iterable of (pos, tile) pairs,
+        are changed. Raise ValueError if there is not enough cells
+        reachable for items, grid and game are then left unchanged """
+        grid = self.grid
+        tiles = list(tiles)
+        previous = [(pos, grid[pos]) for pos, _ in tiles]
+        for pos, tile in tiles:
+            grid.set(pos, tile)
+        try:
+            free_cells = FreeCells(
+                grid.width,
+                grid.height,
+                pathfinder(grid).safe_cells(level.player, level.guardians),
+                self.rng,
+            )
+            items = free_cells.take_many(self.items_needed)
+        except Exception:
+            for pos, tile in reversed(previous):
+                grid.set(pos, tile)
+            raise
+        self.level = level
+        self.free_cells = free_cells
+        self.items = items
+        self._start()
+
+    def change_tiles(self, tiles):
+        """ Change tiles of grid, an iterable of (pos, tile) pairs, and
+        update items placement. Return index of items moved because
+        their cell became a wall or can't be reached anymore.
+        Raise ValueError if there is not enough cells left for them,
+        grid and placement are then put back as they were """
+        tiles = list(tiles)
+        previous = [(pos, self.grid[pos]) for pos, _ in tiles]
+        items = list(self.items)
+        state = self.rng.getstate()
+        try:
+            return self._change_tiles(tiles)
+        except Exception:
+            self._undo(previous, items, state)
+            raise
+
+    def _undo(self, tiles, items, state):
+        """ Put back tiles of grid, position of items and state of
+        random generator saved before a change. Placement index is
+        built again from the whole grid """
+        for pos, tile in reversed(tiles):
+            self.grid.set(pos, tile)
+        self.rng.setstate(state)
+        self.items = items
+        self._index_entities()
+        self._place_again()
+
+    def _change_tiles(self, tiles):
+        """ Change tiles of grid and return index of moved items, like
+        change_tiles but without undo on error.
+        Tiles are changed one at a time, so each change is resolved
+        against a placement index matching the grid. Cells joined to
+        or cut from cells reachable by player are searched around each
+        changed tile, placement index is built again only when they
+        are too many """
+        grid = self.grid
+        blocked = set(self.level.guardians)
+        moved = []
+        for pos, tile in tiles:
+            if grid[pos] == tile:
+                continue
+            grid.set(pos, tile)
+            # Floor neighbours not blocked by a guardian
+            neighbours = [
+                cell
+                for cell in grid.walkable_neighbours(pos)
+                if cell not in blocked
+            ]
+            if grid.is_walkable(pos):
+                local = self._join(pos, neighbours, blocked)
+            elif self._reachable(pos):
+                cut = self._cut(pos, neighbours, blocked)
+                local = cut is not None
+                if local:
+                    moved.extend(self._remove_cells(cut))
+            else:
+                continue
+            if not local:
+                # Placement is built again once all tiles are changed
+                for cell, cell_tile in tiles:
+                    grid.set(cell, cell_tile)
+                again = self._place_again()
+                moved.extend(index for index in again if index not in moved)
+                break
+        return moved
+
+    def _join(self, pos, neighbours, blocked):
+        """ Add new floor at pos and cells it links to reachable cells
+        to placement index. Return False if there are too many
+        cells to search """
+        if not any(self._reachable(cell) for cell in neighbours):
+            return True
+        self.free_cells.release(pos)
+        for cell in neighbours:
+            if self._reachable(cell):
+                continue
+            seen = self._explore(cell, blocked)
+            if seen is None:
+                return False
+            for joined in seen:
+                self.free_cells.release(joined)
+        return True
+
+    def _cut(self, pos, neighbours, blocked):
+        """ Return set of cells not reachable anymore because of new
+        wall at pos, pos included. None if there are too many cells
+        around pos to find them.
+        Cells are searched from each neighbour in turn, one at a time,
+        until all parts around pos are either linked to player start,
+        enclosed, or the only part left """
+        player = self.level.player
+        grid = self.grid
+        # Part of each found cell, parts meeting are merged by
+        # pointing to the same root part
+        owner = {}
+        roots = list(range(len(neighbours)))
+        started = [cell == player for cell in neighbours]
+        queues = []
+        for part, cell in enumerate(neighbours):
+            owner[cell] = part
+            queues.append(deque([cell]))
+
+        while True:
+            # Parts still searched, holding player start or enclosed
+            searched = set()
+            linked = set()
+            enclosed = set()
+            for part, queue in enumerate(queues):
+                root = self._root(roots, part)
+                if started[root]:
+                    linked.add(root)
+                elif queue:
+                    searched.add(root)
+                else:
+                    enclosed.add(root)
+            enclosed -= searched
+            if not searched or (not linked and len(searched) == 1):
+                break
+            if len(owner) > LOCAL_SEARCH:
+                return
+
+            for part, queue in enumerate(queues):
+                if not queue:
+                    continue
+                for cell in grid.walkable_neighbours(queue.popleft()):
+                    if cell in blocked or cell == pos:
+                        continue
+                    other = owner.get(cell)
+                    if other is None:
+                        owner[cell] = part
+                        queue.append(cell)
+                        if cell == player:
+                            started[self._root(roots, part)] = True
+                        continue
+                    root = self._root(roots, part)
+                    other = self._root(roots, other)
+                    if root != other:
+                        roots[other] = root
+                        started[root] = started[root] or started[other]
+
+        cut = {pos}
+        cut.update(
+            cell
+            for cell, part in owner.items()
+            if self._root(roots, part) in enclosed
+        )
+        return cut
+
+    def _root(self, roots, part):
+        """ Return part merged parts of part are pointing to """
+        while roots[part] != part:
+            part = roots[part]
+        return part
+
+    def _explore(self, start, blocked):
+        """ Search floor cells connected to start without crossing
+        blocked positions nor cells already reachable, which are
+        left out. Return set of cells found, None if there are more
+        than LOCAL_SEARCH of them """
+        grid = self.grid
+        seen = {start}
+        queue = [start]
+        while queue:
+            for cell in grid.walkable_neighbours(queue.pop()):
+                if (
+                    cell not in seen
+                    and cell not in blocked
+                    and not self._reachable(cell)
+                ):
+                    seen.add(cell)
+                    if len(seen) > LOCAL_SEARCH:
+                        return
+                    queue.append(cell)
+        return seen
+
+    def check_placement(self):
+        """ Return tuple (valid, reason) telling if placement index
+        holds exactly the cells reachable from player start, free or
+        holding an item. It searches the whole grid, to check the
+        incremental updates of change_tiles """
+        grid = self.grid
+        paths = pathfinder(grid)
+        safe = set(paths.safe_cells(self.level.player, self.level.guardians))
+        free = {grid.index(pos) for pos in self.free_cells}
+        for index, pos in enumerate(self.items):
+            if pos is None:
+                continue
+            if grid.index(pos) in free:
+                return (False, f"item {index} at {pos} is on a free cell")
+            if grid.index(pos) not in safe:
+                return (False, f"item {index} at {pos} can't be reached")
+            free.add(grid.index(pos))
+        for cell in free - safe:
+            return (False, f"free cell {grid.pos(cell)} can't be reached")
+        for cell in safe - free:
+            return (False, f"reachable cell {grid.pos(cell)} is not indexed")
+        return (True, "placement index matches reachable cells")
+
+    def _reachable(self, pos):
+        """ If pos is a cell reachable from player start where items
+        can be placed, either free or holding an item """
+        if pos == self.level.player or pos in self.free_cells:
+            return True
+        return any(kind == ITEM for kind, _ in self.entities.at(pos))
+
+    def _place_again(self):
+        """ Build placement index again from cells reachable from
+        player start. Items out of them are moved, their index
+        is returned. Raise ValueError if there is not enough
+        cells left for them """
+        self.free_cells = FreeCells(
+            self.grid.width,
+            self.grid.height,
+            pathfinder(self.grid).safe_cells(
+                self.level.player, self.level.guardians
+            ),
+            self.rng,
+        )
+        moved = []
+        for index, pos in enumerate(self.items):
+            if pos is None:
+                continue
+            if pos in self.free_cells:
+                self.free_cells.occupy(pos)
+            else:
+                moved.append(index)
+        for index, pos in zip(moved, self._random_positions(len(moved))):
+            self._move_item(index, pos)
+        return moved
+
+    def _remove_cells(self, cells):
+        """ Remove cells from placement index, items on them are moved
+        and their index returned """
+        moved = []
+        for cell in cells:
+            if cell in self.free_cells:
+                self.free_cells.occupy(cell)
+            for kind, index in self.entities.at(cell):
+                if kind == ITEM:
+                    moved.append(index)
+        for index, pos in zip(moved, self._random_positions(len(moved))):
+            self._move_item(index, pos)
+        return moved
+
+    def _move_item(self, index, pos):
+        """ Put item still inside maze on pos """
+        self.entities.move(self.items[index], pos, (ITEM, index))
+        self.items[index] = pos
+
+    def _random_pos(self):
+        """ Return a valid random position for a game item
+        and mark it as occupied """
+        return self.free_cells.take()
+
+    def _random_positions(self, number):
+        """ Return number distinct valid random positions
+        for game items and mark them as occupied """
+        return self.free_cells.take_many(number)
+
+    def check_layout(self):
+        """ Return tuple (solvable, reason) telling if current game
+        can be won """
+        return pathfinder(self.grid).check_layout(
+            self.level.player,
+            self.level.guardians,
+            [pos for pos in self.items if pos is not None],
+        )
+
+    @property
+    def guardian(self):
+        """ Position of first guardian still alive """
+        for pos, status in zip(self.guardians, self.guardians_status):
+            if status == constant.ALIVE:
+                return pos
+        return self.guardians[0]
+
+    @property
+    def ready(self):
+        """ If player has enough items he is ready to fight guardians """
+        return len(self.collected) >= self.items_needed
+
+    @property
+    def finished(self):
+        return self.status == constant.FINISH
+
+    def target(self, action):
+        """ Return cell reached by player with action """
+        move = constant.MOVES[action]
+        return (self.player[0] + move[0], self.player[1] + move[1])
+
+    def step(self, action):
+        """ Move player according to action if possible, then
+        resolve item pickup and guardian encounter on its cell.
+        Guardians move after player unless they are static.
+        Return status of game: constant.PLAY or constant.FINISH """
+        if self.status != constant.PLAY:
+            return self.status
+        self.steps += 1
+
+        if action != constant.STAY:
+            target = self.target(action)
+            if self.grid.is_walkable(target):
+                self.player = target
+
+        for kind, index in self.entities.at(self.player):
+            if kind == GUARDIAN:
+                self._fight(index)
+            else:
+                self._pickup(index)
+
+        if self.guardian_mode != constant.STATIC:
+            self._move_guardians()
+            if self.status == constant.PLAY:
+                for kind, index in self.entities.at(self.player):
+                    if kind == GUARDIAN:
+                        self._fight(index)
+
+        return self.status
+
+    def _move_guardians(self):
+        """ Move each guardian alive of one cell. Chasing guardians
+        follow the flow field toward player, computed once for all
+        of them and only when player changed of cell """
+        self.moved = []
+        if self.status != constant.PLAY:
+            return
+        chase = self.guardian_mode == constant.CHASE
+        if chase:
+            self.flow.update(self.player)
+        for index, pos in enumerate(self.guardians):
+            if self.guardians_status[index] != constant.ALIVE:
+                continue
+            # Guardians out of flow field patrol
+            if chase and self.flow.distance(pos) is not None:
+                action = self.flow.direction(pos)
+            else:
+                action = self._patrol(index, pos)
+            if action == constant.STAY:
+                continue
+            move = constant.MOVES[action]
+            target = (pos[0] + move[0], pos[1] + move[1])
+            self.entities.move(pos, target, (GUARDIAN, index))
+            self.guardians[index] = target
+            self.guardians_direction[index] = action
+            self.moved.append(index)
+
+    def _patrol(self, guardian, pos):
+        """ Return action of a patrolling guardian, going straight
+        and turning right when blocked """
+        for action in PATROL_TURNS[self.guardians_direction[guardian]]:
+            move = constant.MOVES[action]
+            if self.grid.is_walkable((pos[0] + move[0], pos[1] + move[1])):
+                return action
+        return constant.STAY
+
+    def _fight(self, guardian):
+        """ Combat between player and guardian: guardian is defeated
+        if player is ready, else it is the end of the game.
+        Game is won once all guardians are defeated """
+        if not self.ready:
+            self.player_status = constant.DEAD
+            self.status = constant.FINISH
+            return
+        self.guardians_status[guardian] = constant.DEAD
+        self.entities.remove(self.guardians[guardian], (GUARDIAN, guardian))
+        self.guardians_left -= 1
+        if not self.guardians_left:
+            self.status = constant.FINISH
+
+    def _pickup(self, item):
+        """ Player collect item on its cell """
+        self.entities.remove(self.player, (ITEM, item))
+        self.items[item] = None
+        self.free_cells.release(self.player)
+        self.collected.append(item)
+
+    def run(self, actions):
+        """ Play all actions until end of game,
+        return status of game """
+        for action in actions:
+            if self.step(action) != constant.PLAY:
+                break
+        return self.status
+
+    def final_result(self):
+        """ Return a string to indicate win or lose
+        depending on player and guardian status """
+        if self.player_status:
+            return "You deliver Mac Gyver !!"
+        return "You lose, try again!!"
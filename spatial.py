@@ -0,0 +1,76 @@
+""" Contain SpatialHash class, index of game entities by grid cell
+used to find what stands on a cell without scanning all entities """
+
+
+class SpatialHash:
+    """ Entities indexed by the grid cell they stand on. Only occupied
+    cells are stored, finding entities of a cell costs the same
+    whatever the number of entities """
+
+    def __init__(self, entities=()):
+        """ entities is an iterable of (pos, entity) pairs """
+        self._cells = {}
+        self._count = 0
+        for pos, entity in entities:
+            self.add(pos, entity)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, pos):
+        return pos in self._cells
+
+    def __iter__(self):
+        """ Iterate over (pos, entity) pairs """
+        for pos, entities in self._cells.items():
+            for entity in entities:
+                yield (pos, entity)
+
+    def at(self, pos):
+        """ Return tuple of entities standing on pos """
+        entities = self._cells.get(pos)
+        if entities is None:
+            return ()
+        return tuple(entities)
+
+    def add(self, pos, entity):
+        """ Put entity on pos """
+        self._cells.setdefault(pos, []).append(entity)
+        self._count += 1
+
+    def remove(self, pos, entity):
+        """ Remove entity from pos, raise KeyError if it is not there """
+        entities = self._cells.get(pos)
+        if entities is None or entity not in entities:
+            raise KeyError((pos, entity))
+        entities.remove(entity)
+        if not entities:
+            del self._cells[pos]
+        self._count -= 1
+
+    def move(self, old, new, entity):
+        """ Move entity from old to new position """
+        self.remove(old, entity)
+        self.add(new, entity)
+
+    def clear(self):
+        self._cells.clear()
+        self._count = 0
+
+    def area(self, left, top, right, bottom):
+        """ Iterate over (pos, entity) pairs inside cells rectangle,
+        right and bottom excluded. Only the smallest of the area
+        and the occupied cells is scanned """
+        cells = self._cells
+        if (right - left) * (bottom - top) <= len(cells):
+            for y in range(top, bottom):
+                for x in range(left, right):
+                    entities = cells.get((x, y))
+                    if entities is not None:
+                        for entity in entities:
+                            yield ((x, y), entity)
+        else:
+            for pos, entities in cells.items():
+                if left <= pos[0] < right and top <= pos[1] < bottom:
+                    for entity in entities:
+                        yield (pos, entity)
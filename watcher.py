@@ -0,0 +1,47 @@
+""" Contain FileWatcher class, detection of modified files by polling,
+used to reload a level while it is edited """
+import os
+import time
+
+import constant
+
+
+def file_version(path):
+    """ Return what identify a version of file at path,
+    None if it does not exist """
+    try:
+        stat = os.stat(str(path))
+    except OSError:
+        return
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class FileWatcher:
+    """ Files checked for modification at most every interval seconds.
+    A file is modified when its modification time or size changes,
+    or when it appears or disappears """
+
+    def __init__(self, paths, interval=constant.HOT_RELOAD_INTERVAL):
+        self.interval = interval
+        self._stats = {path: file_version(path) for path in paths}
+        self._checked = time.perf_counter()
+
+    @property
+    def next_check(self):
+        """ Time of next check, in time.perf_counter referential """
+        return self._checked + self.interval
+
+    def changed(self):
+        """ Return list of paths modified since previous call,
+        empty if interval is not elapsed """
+        now = time.perf_counter()
+        if now < self.next_check:
+            return []
+        self._checked = now
+        changed = []
+        for path, previous in self._stats.items():
+            stat = file_version(path)
+            if stat != previous:
+                self._stats[path] = stat
+                changed.append(path)
+        return changed